@@ -5,118 +5,973 @@
 Utility supposed to provide CLI interface to satellite_api_benchmark
 """
 
+import os
 import sys
+import time
+import bisect
+import heapq
+import argparse
+import functools
+import logging
+import traceback
 import multiprocessing
+import Queue
 
 import tabulate
 
 import satellite_api_benchmark
 
 
+PERCENTILES = [50, 90, 99, 99.9]
+OFFLINE_ACTIONS = ['report', 'compare', 'agent']
+# Worker busy on CPU for bigger share of the run is CPU bound itself and
+# workers using bigger share of all CPUs compete with local Satellite
+WORKER_CPU_WARNING = 0.8
+CLIENT_CPU_WARNING = 0.5
+# Open-loop run achieving less of its target rate or starting calls later
+# behind schedule (seconds) did not sustain the rate
+RATE_WARNING = 0.95
+START_LAG_WARNING = 1.0
+# Latency growing faster than payload size to this power is reported
+SUPERLINEAR_EXPONENT = 1.2
+
+
+def latency_columns(histogram):
+    """Return avg, min, percentiles and max of given histogram as a list"""
+    return [histogram.mean(), histogram.min] \
+        + [histogram.percentile(p) for p in PERCENTILES] \
+        + [histogram.max]
+
+
 def print_results(results):
-    """Print nicely formatted results of the measurements"""
+    """Print nicely formatted results of the measurements, results is list
+       with iterable of measurements for every process"""
+    latency_header = ['avg duration', 'min'] \
+        + ['p%s' % p for p in PERCENTILES] + ['max']
     # Main table
-    header = ['process', 'method', 'repeats', 'avg duration']
-    summary = {}   # for summary data, assumes we do not call one method with different inputs
+    # Connections opened by unmeasured logins are not counted, so keep-alive
+    # workers usually report none
+    header = ['process', 'method', 'repeats', 'connections opened'] \
+        + latency_header
+    summary = {}   # per method histograms merged over all processes
     total = 0   # for grand total duration
+    connections = 0   # for grand total of connections opened by measured calls
     table = []
     for i in range(len(results)):
+        process = {}   # per method histograms of this process, in call order
+        process_connections = {}
+        order = []
         for r in results[i]:
             # Fill data for main table
-            duration = float(r['end']-r['start'])
-            result = [r['method'], r['repeats'], duration/r['repeats']]
-            table.append([i]+result)
+            if r['method'] not in process:
+                process[r['method']] = satellite_api_benchmark.Histogram()
+                process_connections[r['method']] = 0
+                order.append(r['method'])
+            process[r['method']].merge(r['histogram'])
+            process_connections[r['method']] += r['connections']
+            # Update total duration and connections
+            total += r['histogram'].total
+            connections += r['connections']
+        for method in order:
+            histogram = process[method]
+            table.append([i, method, histogram.count,
+                          process_connections[method]]
+                         + latency_columns(histogram))
             # Fill data for summary table
-            if r['method'] not in summary:
-                summary[r['method']] = {'repeats': 0, 'duration': 0}
-            summary[r['method']]['repeats'] += r['repeats']
-            summary[r['method']]['duration'] += duration
-            # Update total duration
-            total += duration
+            if method not in summary:
+                summary[method] = satellite_api_benchmark.Histogram()
+            summary[method].merge(histogram)
     print tabulate.tabulate(table, headers=header, tablefmt="psql")
     # Summary table
     print
     summary_table = []
-    summary_header = ['methods sumarised', 'avg duration']
-    for method, data in summary.items():
-        summary_table.append([method, data['duration']/data['repeats']])
+    summary_header = ['methods sumarised', 'repeats'] + latency_header \
+        + ['avg ci95 +-', 'p50 ci95', 'p99 ci95']
+    for method, histogram in summary.items():
+        summary_table.append([method, histogram.count]
+                             + latency_columns(histogram)
+                             + [histogram.mean_ci()]
+                             + ['%.6f-%.6f' % histogram.percentile_ci(p)
+                                for p in [50, 99]])
     print tabulate.tabulate(summary_table, headers=summary_header, tablefmt="psql")
     # Total
     print
     print "TOTAL %s %s" % (len(results), total)
+    print "CONNECTIONS OPENED BY MEASURED CALLS %s" % connections
+
+
+def print_phases(results):
+    """Print average time per call spent in every phase of the call and
+       average request and response sizes for every method, so time spent
+       by client parsing big responses is not mistaken for server slowness"""
+    phases = satellite_api_benchmark.PHASES
+    header = ['method', 'calls'] + ['%s' % p for p in phases] \
+        + ['client share', 'request bytes', 'response bytes']
+    summary = {}   # method: [calls, phase and size totals]
+    order = []
+    for actions in results:
+        for r in actions:
+            if 'phases' not in r:
+                continue
+            if r['method'] not in summary:
+                summary[r['method']] = [0, {}]
+                order.append(r['method'])
+            summary[r['method']][0] += r['repeats']
+            totals = summary[r['method']][1]
+            for k, v in r['phases'].items():
+                totals[k] = totals.get(k, 0) + v
+    if not summary:
+        return
+    table = []
+    for method in order:
+        calls, totals = summary[method]
+        spent = sum([totals.get(p, 0) for p in phases])
+        client = totals.get('write', 0) + totals.get('unmarshal', 0)
+        table.append([method, calls]
+                     + [totals.get(p, 0) / calls for p in phases]
+                     + [client / spent if spent else None,
+                        totals.get('request_bytes', 0) / calls,
+                        totals.get('response_bytes', 0) / calls])
+    print tabulate.tabulate(table, headers=header, tablefmt="psql")
+
+
+def print_usage(usages, cpus=None):
+    """Print resource usage of workers and warn when they used enough CPU
+       to distort the measurement. cpus is number of CPUs of all hosts
+       running the workers, CPUs of this host by default."""
+    if not usages:
+        return
+    header = ['worker', 'pid', 'user', 'sys', 'cpu', 'rss MB', 'max rss MB',
+              'voluntary cs', 'involuntary cs']
+    table = []
+    for i, u in enumerate(usages):
+        table.append([i, u['pid'], u['user'], u['sys'], u['cpu'],
+                      u['rss'] / 1024.0 if u['rss'] is not None else None,
+                      u['maxrss'] / 1024.0, u['voluntary'], u['involuntary']])
+    print tabulate.tabulate(table, headers=header, tablefmt="psql")
+    wall = max([u['end'] for u in usages]) - min([u['start'] for u in usages])
+    cpus = cpus or multiprocessing.cpu_count()
+    client = sum([u['user'] + u['sys'] for u in usages]) / wall / cpus
+    print "CLIENT CPU %.2f of %s CPUs" % (client, cpus)
+    for i, u in enumerate(usages):
+        if u['cpu'] > WORKER_CPU_WARNING:
+            print "WARNING: Worker %s was busy on CPU %.0f%% of its run, its" \
+                  " latencies include time waiting for itself" % (i, u['cpu'] * 100)
+    if client > CLIENT_CPU_WARNING:
+        print "WARNING: Workers used %.0f%% of all CPUs of this host, results" \
+              " are distorted if Satellite runs here as well" % (client * 100)
+
+
+def print_samples(samples):
+    """Print summary of server process groups resource usage"""
+    groups = {}
+    for sample in samples:
+        groups.setdefault(sample['group'], []).append(sample)
+    header = ['process group', 'processes', 'avg cpu', 'max cpu',
+              'max rss MB', 'max threads', 'read MB/s', 'write MB/s']
+    table = []
+    for group, series in sorted(groups.items()):
+        table.append([group, max([s['processes'] for s in series]),
+                      sum([s['cpu'] for s in series]) / len(series),
+                      max([s['cpu'] for s in series]),
+                      max([s['rss'] for s in series]) / 1024.0 / 1024.0,
+                      max([s['threads'] for s in series]),
+                      sum([s['read_bytes'] for s in series]) / len(series) / 1024.0 / 1024.0,
+                      sum([s['write_bytes'] for s in series]) / len(series) / 1024.0 / 1024.0])
+    print tabulate.tabulate(table, headers=header, tablefmt="psql")
+
+
+def print_spikes(results, samples, start, count=10):
+    """Print count slowest measurements (with their end in seconds since
+       start of the run) with CPU usage of every server process group
+       sampled right after them"""
+    groups = {}   # group: (times, samples)
+    for sample in samples:
+        times, series = groups.setdefault(sample['group'], ([], []))
+        times.append(sample['time'])
+        series.append(sample)
+    slowest = heapq.nlargest(count, [r for actions in results for r in actions],
+                             key=lambda r: r['histogram'].max)
+    header = ['method', 'args', 'max duration', 'at second'] \
+        + ['%s cpu' % g for g in sorted(groups)]
+    table = []
+    for r in slowest:
+        row = [r['method'], str(r['args'])[:40], r['histogram'].max,
+               r['end'] - start]
+        for group in sorted(groups):
+            # Sample taken after the call covers the interval of the call
+            times, series = groups[group]
+            i = bisect.bisect_left(times, r['end'])
+            row.append(series[i]['cpu'] if i < len(series) else None)
+        table.append(row)
+    print tabulate.tabulate(table, headers=header, tablefmt="psql")
 
 
-def check(username, password, hostname):
+def print_window(files, window):
+    """Print how much workers overlapped and how many measurements were
+       made while all of them were running (measurements crossing edges of
+       the window included)"""
+    if window is None:
+        return
+    total = sum([r['histogram'].count for f in files
+                 for r in satellite_api_benchmark.load_results(f)])
+    print "WORKERS %s, START SKEW %.3f s, END SKEW %.3f s" \
+        % (window['workers'], window['start_skew'], window['end_skew'])
+    if window['window'] is None:
+        print "WARNING: Workers never ran all at once, reporting all measurements"
+        return
+    start, end = window['window']
+    counted = sum([r['histogram'].count for f in files
+                   for r in satellite_api_benchmark.load_results(f, (start, end))])
+    print "CONCURRENT WINDOW %.3f s of %.3f s, counting %s of %s calls" \
+        % (end - start, window['end'] - window['start'], counted, total)
+
+
+def measurement_window(results_dir, whole_run=False):
+    """Print overlap of workers in results_dir and return window of
+       measurements to count, None when all are counted"""
+    if whole_run:
+        return None
+    files = satellite_api_benchmark.results_files(results_dir)
+    window = satellite_api_benchmark.concurrent_window(results_dir)
+    print_window(files, window)
+    return window and window['window']
+
+
+def report(results_dir, whole_run=False):
+    """Print results, phases of calls and resource usage of workers and
+       server processes stored in results_dir. Only measurements made while
+       all workers were running are counted unless whole_run is set."""
+    files = satellite_api_benchmark.results_files(results_dir)
+    window = measurement_window(results_dir, whole_run)
+    if not whole_run:
+        print
+    print_results([satellite_api_benchmark.load_results(f, window) for f in files])
+    print
+    print_phases([satellite_api_benchmark.load_results(f, window) for f in files])
+    print
+    print_usage([u for f in files for u in satellite_api_benchmark.load_usage(f)],
+                satellite_api_benchmark.load_run(results_dir).get('cpus'))
+    samples = satellite_api_benchmark.load_samples(results_dir)
+    if samples:
+        print
+        print_samples(samples)
+        print
+        # The first sample is taken one interval after the run started
+        start = satellite_api_benchmark.load_run(results_dir).get('released')
+        if start is None:
+            start = min([r['start'] for f in files
+                         for r in satellite_api_benchmark.load_results(f)])
+        print_spikes([satellite_api_benchmark.load_results(f, window)
+                      for f in files], samples, start)
+
+
+def compare(old_dir, new_dir, threshold, alpha, iterations, whole_run=False):
+    """Print comparison of latencies of every method in two results,
+       return number of regressions. Measurements are counted the same way
+       report counts them."""
+    histograms = []
+    for results_dir in [old_dir, new_dir]:
+        print "RESULTS DIR %s" % results_dir
+        window = measurement_window(results_dir, whole_run)
+        histograms.append(satellite_api_benchmark.method_histograms(
+            [satellite_api_benchmark.load_results(f, window)
+             for f in satellite_api_benchmark.results_files(results_dir)]))
+    print
+    rows = satellite_api_benchmark.compare(histograms[0], histograms[1],
+                                           threshold, alpha, iterations)
+    header = ['method', 'old calls', 'new calls', 'old avg', 'new avg',
+              'change', 'ci low', 'ci high', 'old p50', 'new p50',
+              'old p99', 'new p99', 'p-value', '']
+    table = []
+    for row in rows:
+        old, new = row['old'], row['new']
+        table.append([row['method'], old.count, new.count, old.mean(),
+                      new.mean(), row['change'], row['ci'][0], row['ci'][1],
+                      old.percentile(50), new.percentile(50),
+                      old.percentile(99), new.percentile(99), row['p'],
+                      row['verdict']])
+    print tabulate.tabulate(table, headers=header, tablefmt="psql")
+    for i, histogram in enumerate(histograms):
+        others = set(histograms[1 - i]) - set(histogram)
+        if others:
+            print "WARNING: Methods missing in %s: %s" \
+                % ([old_dir, new_dir][i], ', '.join(sorted(others)))
+    regressions = len([r for r in rows if r['verdict'] == 'REGRESSION'])
+    print "REGRESSIONS %s" % regressions
+    return regressions
+
+
+def print_rates(results):
+    """Print achieved rate, backlog and latency percentiles of every target
+       rate of open-loop runs and warn about rates which were not
+       sustained"""
+    header = ['target rate', 'achieved rate', 'max backlog', 'max start lag',
+              'calls', 'errors'] \
+        + ['avg latency', 'min'] + ['p%s' % p for p in PERCENTILES] + ['max']
+    table = []
+    overloaded = []
+    for actions in results:
+        histogram = satellite_api_benchmark.Histogram()
+        for r in actions:
+            histogram.merge(r['histogram'])
+        a = actions[0]
+        table.append([a['rate'], a['achieved_rate'], a['max_backlog'],
+                      a['max_start_lag'], histogram.count,
+                      sum([r['errors'] for r in actions])]
+                     + latency_columns(histogram))
+        if a['achieved_rate'] < a['rate'] * RATE_WARNING \
+                or a['max_start_lag'] > START_LAG_WARNING:
+            overloaded.append(a)
+    print tabulate.tabulate(table, headers=header, tablefmt="psql")
+    for a in overloaded:
+        print "WARNING: Rate %s calls/s was not sustained (achieved %.2f," \
+              " up to %s calls waited for a thread, up to %.2f s behind" \
+              " schedule), latencies include the growing backlog" \
+              % (a['rate'], a['achieved_rate'] or 0, a['max_backlog'],
+                 a['max_start_lag'])
+
+
+def print_checkin(actions):
+    """Print throughput and latency of profile uploads for every profile
+       and how latency grows with payload size: exponent between every two
+       consecutive profiles and fitted over all of them"""
+    header = ['method', 'packages', 'devices', 'interfaces', 'payload KB',
+              'calls/s', 'avg latency', 'p50', 'p99', 'exponent']
+    table = []
+    points = {}   # method: [(payload size, average latency)]
+    for a in actions:
+        histogram = a['histogram']
+        previous = points.get(a['method'], [])[-1:]
+        points.setdefault(a['method'], []).append(
+            (a['payload_bytes'], histogram.mean()))
+        exponent = satellite_api_benchmark.scaling_exponent(
+            previous + points[a['method']][-1:])
+        table.append([a['method'], a['profile']['packages'],
+                      a['profile']['devices'], a['profile']['interfaces'],
+                      a['payload_bytes'] / 1024.0,
+                      histogram.count / (a['end'] - a['start']),
+                      histogram.mean(), histogram.percentile(50),
+                      histogram.percentile(99), exponent])
+    table.sort(key=lambda row: row[0])
+    print tabulate.tabulate(table, headers=header, tablefmt="psql")
+    print
+    for method in sorted(points):
+        exponent = satellite_api_benchmark.scaling_exponent(points[method])
+        if exponent is None:
+            continue
+        print "EXPONENT %s %.2f%s" % (method, exponent,
+                                      ' (superlinear)' if exponent > SUPERLINEAR_EXPONENT else '')
+
+
+def check(username, password, hostname, **kwargs):
     """Check if satellite is clean"""
-    sab = satellite_api_benchmark.Satellite5(username, password, hostname)
+    sab = satellite_api_benchmark.Satellite5(username, password, hostname, **kwargs)
     return sab.check()
 
 
-def setup(username, password, hostname):
-    """Create all required elements"""
-    sab = satellite_api_benchmark.Satellite5(username, password, hostname)
-    return sab.setup()
+def setup(username, password, hostname, **kwargs):
+    """Create all required elements, return IDs of created orgs and
+       measurements of the setup phases"""
+    sab = satellite_api_benchmark.Satellite5(username, password, hostname, **kwargs)
+    return sab.setup(), sab.actions
 
 
-def run(username, password, hostname):
-    """Run benchmark"""
-    sab = satellite_api_benchmark.Satellite5(username, password, hostname)
+def run(username, password, hostname, barrier=None, **kwargs):
+    """Run benchmark, call barrier (when given) after logging in and before
+       starting the measurements"""
+    sab = satellite_api_benchmark.Satellite5(username, password, hostname, **kwargs)
+    if barrier is not None:
+        barrier()
     return sab.run()
 
 
-def cleanup(username, password, hostname, orgs):
+def wait_for_start(ready, start):
+    """Tell parent process that this worker is ready and wait until all
+       workers are"""
+    ready.put(os.getpid())
+    start.wait()
+
+
+def start_together(results, ready, start, ready_callback=None):
+    """Wait until every pool worker logged in (or failed before doing so),
+       then call ready_callback and let all of them start measuring. Return
+       time when they were released."""
+    count = 0
+    try:
+        # Worker waiting for start can not finish, so finished ones failed
+        while count + len([r for r in results if r.ready()]) < len(results):
+            try:
+                ready.get(timeout=0.1)
+                count += 1
+            except Queue.Empty:
+                pass
+        if ready_callback is not None:
+            ready_callback()
+    finally:
+        # Never leave workers waiting, even when the callback failed
+        released = time.time()
+        start.set()
+    return released
+
+
+def run_worker(username, password, hostname, **kwargs):
+    """Run benchmark in pool worker process"""
+    try:
+        return run(username, password, hostname, **kwargs)
+    except Exception, e:
+        # Some exceptions (e.g. xmlrpclib.Fault) can not be unpickled in
+        # the parent process, which would then wait for the worker forever
+        traceback.print_exc()
+        raise RuntimeError("%s: %s" % (e.__class__.__name__, e))
+
+
+def run_workers(procs, username, password, hostname, results_dir,
+                pin_cpus=None, ready_callback=None, **kwargs):
+    """Run benchmark in procs parallel workers streaming their measurements
+       into results_dir, return wall time of the run. Workers are pinned to
+       CPUs from pin_cpus list in round robin when given. All workers log
+       in first and start measuring at once, after ready_callback (when
+       given) returns."""
+    kwargs = dict(kwargs, results_dir=results_dir)
+    start = time.time()
+    # Run without multiprocessing module when number of procs is default
+    # 1 as it makes it easier to see tracebacks
+    if procs > 1:
+        results = []
+        manager = multiprocessing.Manager()
+        ready, start_event = manager.Queue(), manager.Event()
+        kwargs['barrier'] = functools.partial(wait_for_start, ready, start_event)
+        # Define process pools and start processes
+        pool = multiprocessing.Pool(processes=procs)
+        for i in range(procs):
+            worker_kwargs = dict(kwargs)
+            if pin_cpus:
+                worker_kwargs['pin_cpu'] = pin_cpus[i % len(pin_cpus)]
+            # Every worker samples different items, still reproducibly
+            if kwargs.get('seed') is not None:
+                worker_kwargs['seed'] = kwargs['seed'] + i
+            results.append(
+                pool.apply_async(
+                    run_worker,
+                    (username, password, hostname),
+                    worker_kwargs
+                )
+            )
+        try:
+            released = start_together(results, ready, start_event,
+                                      ready_callback)
+        except Exception:
+            # Run was aborted (e.g. by coordinator), do not leave workers
+            # measuring
+            pool.terminate()
+            manager.shutdown()
+            raise
+        satellite_api_benchmark.mark_run(results_dir, released=released)
+        # Do not allow submitting more processes and wait for workers to exit
+        pool.close()
+        pool.join()
+        manager.shutdown()
+        # Workers have streamed their measurements into results_dir, so
+        # even measurements of failed workers are reported
+        for i in range(len(results)):
+            try:
+                results[i].get()
+            except Exception, e:
+                print "ERROR: Worker %s failed: %s" % (i, e)
+    else:
+        if pin_cpus:
+            kwargs['pin_cpu'] = pin_cpus[0]
+        run(username, password, hostname, barrier=ready_callback, **kwargs)
+    return time.time() - start
+
+
+def sweep(levels, sweep_warmup, repeats, knee, username, password, hostname,
+          results_dir, **kwargs):
+    """Run benchmark at every concurrency level (after optional warm-up
+       runs which are not counted) and print throughput and latency
+       percentiles of every level and the knee where adding more
+       concurrency does not add throughput anymore"""
+    table = []   # per level and method
+    overview = []   # per level
+    throughputs = []
+    for procs in levels:
+        for i in range(sweep_warmup):
+            print "SWEEP %s warm-up %s" % (procs, i)
+            run_workers(procs, username, password, hostname,
+                        os.path.join(results_dir, 'level-%s' % procs, 'warmup-%s' % i),
+                        **kwargs)
+        histograms = {}
+        duration = 0
+        for i in range(repeats):
+            print "SWEEP %s run %s" % (procs, i)
+            level_dir = os.path.join(results_dir, 'level-%s' % procs, 'run-%s' % i)
+            wall = run_workers(procs, username, password, hostname,
+                               level_dir, **kwargs)
+            # Count only the time all workers of the level were running
+            files = satellite_api_benchmark.results_files(level_dir)
+            window = satellite_api_benchmark.concurrent_window(level_dir)
+            window = window and window['window']
+            duration += window[1] - window[0] if window else wall
+            for f in files:
+                for r in satellite_api_benchmark.load_results(f, window):
+                    if r['method'] not in histograms:
+                        histograms[r['method']] = satellite_api_benchmark.Histogram()
+                    histograms[r['method']].merge(r['histogram'])
+        total = satellite_api_benchmark.Histogram()
+        for method, histogram in sorted(histograms.items()):
+            total.merge(histogram)
+            table.append([procs, method, histogram.count / duration,
+                          histogram.percentile(50), histogram.percentile(99)])
+        throughputs.append(total.count / duration)
+        overview.append([procs, total.count / duration,
+                         throughputs[-1] / throughputs[0],
+                         total.percentile(50), total.percentile(99)])
+    print tabulate.tabulate(table, headers=['procs', 'method', 'calls/s', 'p50', 'p99'], tablefmt="psql")
+    print
+    # Knee is the last level after which throughput grows by less than
+    # knee ratio
+    knee_level = None
+    for i in range(len(levels) - 1):
+        if throughputs[i + 1] < throughputs[i] * (1 + knee):
+            knee_level = levels[i]
+            break
+    for row in overview:
+        row.append('<- knee' if row[0] == knee_level else '')
+    print tabulate.tabulate(overview, headers=['procs', 'calls/s', 'speedup', 'p50', 'p99', ''], tablefmt="psql")
+    print
+    if knee_level is None:
+        print "KNEE not found, throughput still grows at %s" % levels[-1]
+    else:
+        print "KNEE %s" % knee_level
+
+
+def run_rate(username, password, hostname, rates, rate_duration, **kwargs):
+    """Run open-loop benchmark at every given rate"""
+    sab = satellite_api_benchmark.Satellite5(username, password, hostname, **kwargs)
+    results = []
+    for rate in rates:
+        sab.actions = []
+        results.append(sab.run_rate(rate, rate_duration))
+    return results
+
+
+def replay(username, password, hostname, trace, speed, **kwargs):
+    """Replay recorded trace"""
+    sab = satellite_api_benchmark.Satellite5(username, password, hostname, **kwargs)
+    return sab.replay(satellite_api_benchmark.load_trace(trace), speed)
+
+
+def register(username, password, hostname, count, **kwargs):
+    """Register systems and measure registration throughput"""
+    sab = satellite_api_benchmark.Satellite5(username, password, hostname, **kwargs)
+    return sab.register(count)
+
+
+def checkin(username, password, hostname, profiles, count, **kwargs):
+    """Register systems with every profile and measure upload of their
+       hardware and package profiles"""
+    sab = satellite_api_benchmark.Satellite5(username, password, hostname, **kwargs)
+    return sab.checkin(profiles, count)
+
+
+def cleanup(username, password, hostname, orgs, keep_cache=False, **kwargs):
     """Cleanup all setup and temporary files we have created"""
-    sab = satellite_api_benchmark.Satellite5(username, password, hostname)
-    sab.cleanup(orgs)
+    sab = satellite_api_benchmark.Satellite5(username, password, hostname, **kwargs)
+    sab.cleanup(orgs, keep_cache)
+
+
+def sample_size(text):
+    """Return number of items (like 10) or fraction (like 0.1) to sample"""
+    if '.' in text:
+        value = float(text)
+        if not 0 < value < 1:
+            raise argparse.ArgumentTypeError(
+                "%s is neither number of items nor fraction below 1" % text)
+        return value
+    return int(text)
+
+
+def profile_list(text):
+    """Return list of profiles given like 1000:60:4,3000:200:24 (numbers
+       of packages, devices and interfaces, missing ones are default)"""
+    profiles = []
+    for item in text.split(','):
+        if item == '':
+            continue
+        profile = dict(satellite_api_benchmark.PROFILE)
+        for key, value in zip(['packages', 'devices', 'interfaces'], item.split(':')):
+            if value != '':
+                profile[key] = int(value)
+        profiles.append(profile)
+    return profiles
+
+
+def cpu_list(text):
+    """Return list of CPUs given like 0-3,6"""
+    cpus = []
+    for item in text.split(','):
+        if '-' in item:
+            first, last = item.split('-')
+            cpus += range(int(first), int(last) + 1)
+        elif item != '':
+            cpus.append(int(item))
+    return cpus
+
+
+def parse_args():
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(
+        description='Run API benchmark against Red Hat Satellite 5',
+        usage='%(prog)s [options] username password hostname action [params]'
+              '\n       %(prog)s [options] action [params]'
+              ' (actions not talking to Satellite)')
+    parser.add_argument('arguments', nargs='+', metavar='argument',
+                        help='Satellite admin user, password of the user,'
+                             ' Satellite hostname, action (check, setup,'
+                             ' run, sweep, rate, replay, register, checkin or'
+                             ' cleanup) and its parameters (number of'
+                             ' processes for run, comma separated numbers of'
+                             ' processes for sweep, comma separated calls per'
+                             ' second for rate, trace directory for replay,'
+                             ' number of systems for register, comma'
+                             ' separated profiles PACKAGES:DEVICES:INTERFACES'
+                             ' for checkin, comma separated org IDs for'
+                             ' cleanup); or action'
+                             ' not talking to Satellite (report, compare or'
+                             ' agent) and its parameters (results directory'
+                             ' for report, two results directories for'
+                             ' compare, TCP port for agent)')
+    parser.add_argument('--connection', default='keepalive',
+                        choices=satellite_api_benchmark.CONNECTION_MODES,
+                        help='keep one persistent connection per worker or'
+                             ' open fresh connection for every API call'
+                             ' (default: %(default)s)')
+    parser.add_argument('--scheme', default='https', choices=['https', 'http'],
+                        help='protocol used for API calls, plain http is'
+                             ' useful with local mock server'
+                             ' (default: %(default)s)')
+    parser.add_argument('--build-procs', type=int,
+                        help='number of processes building packages during'
+                             ' setup (default: number of CPUs)')
+    parser.add_argument('--build-cache',
+                        default=satellite_api_benchmark.BUILD_CACHE,
+                        help='directory where built packages are cached'
+                             ' between setups, empty to disable'
+                             ' (default: %(default)s)')
+    parser.add_argument('--push-batch', type=int, default=50,
+                        help='number of packages uploaded by one rhnpush'
+                             ' invocation during setup (default: %(default)s)')
+    parser.add_argument('--push-procs', type=int, default=4,
+                        help='number of concurrent rhnpush invocations'
+                             ' during setup (default: %(default)s)')
+    parser.add_argument('--setup-procs', type=int, default=4,
+                        help='number of concurrent API connections creating'
+                             ' orgs, users, channels, erratas and activation'
+                             ' keys during setup (default: %(default)s)')
+    parser.add_argument('--register-procs', type=int, default=4,
+                        help='number of concurrent registrants in setup and'
+                             ' register (default: %(default)s)')
+    parser.add_argument('--multicall', type=int, default=0, metavar='BATCH',
+                        help='in run, send detail calls in batches of BATCH'
+                             ' calls through system.multicall (default: send'
+                             ' every call on its own)')
+    parser.add_argument('--checkin-systems', type=int, default=10,
+                        metavar='COUNT',
+                        help='number of systems registered with every'
+                             ' profile in checkin (default: %(default)s)')
+    parser.add_argument('--rate-duration', type=float, default=60,
+                        help='seconds to keep every target rate in rate'
+                             ' (default: %(default)s)')
+    parser.add_argument('--rate-threads', type=int, default=32,
+                        help='number of threads making calls in rate, has to'
+                             ' be high enough to keep up with target rate'
+                             ' (default: %(default)s)')
+    parser.add_argument('--results-dir',
+                        help='directory where run and sweep workers stream'
+                             ' their measurements, should be empty (default:'
+                             ' results-<date>-<time>)')
+    parser.add_argument('--sweep-warmup', type=int, default=0,
+                        help='number of not counted warm-up runs at every'
+                             ' sweep level (default: %(default)s)')
+    parser.add_argument('--sweep-repeats', type=int, default=1,
+                        help='number of counted runs at every sweep level'
+                             ' (default: %(default)s)')
+    parser.add_argument('--knee', type=float, default=0.1,
+                        help='sweep reports knee at level after which'
+                             ' throughput grows by less than this ratio'
+                             ' (default: %(default)s)')
+    parser.add_argument('--duration', type=float, metavar='SECONDS',
+                        help='in run and sweep, repeat the workload for this'
+                             ' many seconds instead of running it once')
+    parser.add_argument('--warmup', type=float, default=0, metavar='SECONDS',
+                        help='with --duration, run the workload this many'
+                             ' seconds before measurements are recorded'
+                             ' (default: %(default)s)')
+    parser.add_argument('--steady-window', type=int, default=3,
+                        metavar='ITERATIONS',
+                        help='with --duration, steady state is reached when'
+                             ' throughput of every method is stable over this'
+                             ' many iterations, only iterations from then on'
+                             ' are reported (default: %(default)s)')
+    parser.add_argument('--steady-cv', type=float, default=0.05,
+                        help='maximal coefficient of variation of stable'
+                             ' throughput (default: %(default)s)')
+    parser.add_argument('--stop-on-steady', action='store_true',
+                        help='with --duration, stop once steady state is'
+                             ' reached')
+    parser.add_argument('--workload', default='default',
+                        help='name of shipped workload (%s) or path to JSON'
+                             ' or YAML file with workload run, sweep and rate'
+                             ' make (default: %%(default)s)'
+                             % ', '.join(satellite_api_benchmark.shipped_workloads()))
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help='multiply numbers of entities setup creates'
+                             ' (%s) by this factor (default: %%(default)s)'
+                             % ', '.join('%s %s' % i for i in sorted(
+                                 satellite_api_benchmark.DATASET.items())))
+    parser.add_argument('--size', action='append', default=[],
+                        metavar='ENTITY=COUNT',
+                        help='number of given entities setup creates,'
+                             ' overrides --scale, can be given multiple times')
+    parser.add_argument('--pin-cpus', type=cpu_list, metavar='CPUS',
+                        help='in run and sweep, pin workers to these CPUs'
+                             ' (e.g. 0-3,6) in round robin using taskset, so'
+                             ' they do not compete with local Satellite')
+    parser.add_argument('--agents', type=lambda text: text.split(','),
+                        metavar='HOST:PORT,...',
+                        help='in run, start workers on these agents (started'
+                             ' by agent action) at once instead of locally,'
+                             ' number of processes is per agent')
+    parser.add_argument('--whole-run', action='store_true',
+                        help='in run, report and compare, count also'
+                             ' measurements made while not all workers were'
+                             ' running (by default only the window when all'
+                             ' of them were measuring at once is counted)')
+    parser.add_argument('--sample-interval', type=float, default=1.0,
+                        help='in run, sample resource usage of local server'
+                             ' processes every this many seconds, 0 disables'
+                             ' sampling (default: %(default)s)')
+    parser.add_argument('--sample-process', action='append', default=[],
+                        metavar='GROUP=REGEXP',
+                        help='sample processes whose command line matches'
+                             ' REGEXP as GROUP, can be given multiple times,'
+                             ' the first matching group wins'
+                             ' (default: %s)' % ', '.join(
+                                 '%s=%s' % i for i in
+                                 satellite_api_benchmark.PROCESS_GROUPS))
+    parser.add_argument('--interval', type=float, default=1.0,
+                        help='in run, length in seconds of intervals'
+                             ' reported by --live, --csv and --prometheus-*'
+                             ' (default: %(default)s)')
+    parser.add_argument('--live', action='store_true',
+                        help='in run, print calls/s, errors and latency of'
+                             ' every interval on console (only warnings are'
+                             ' logged then)')
+    parser.add_argument('--csv', metavar='FILE',
+                        help='in run, write calls/s, errors and latency'
+                             ' percentiles of every interval and method into'
+                             ' CSV file')
+    parser.add_argument('--prometheus-file', metavar='FILE',
+                        help='in run, keep metrics of the last interval in'
+                             ' Prometheus text format in FILE (e.g. for'
+                             ' node_exporter textfile collector)')
+    parser.add_argument('--prometheus-port', type=int, metavar='PORT',
+                        help='in run, serve metrics of the last interval in'
+                             ' Prometheus text format on http://localhost:PORT/')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='compare reports regression when average'
+                             ' latency of a method grew by more than this'
+                             ' ratio (default: %(default)s)')
+    parser.add_argument('--alpha', type=float, default=0.01,
+                        help='compare reports regression only when'
+                             ' p-value of Mann-Whitney U test is below this'
+                             ' significance level (default: %(default)s)')
+    parser.add_argument('--bootstrap', type=int, default=200,
+                        metavar='ITERATIONS',
+                        help='number of bootstrap resamples of confidence'
+                             ' intervals in compare (default: %(default)s)')
+    parser.add_argument('--record-trace', metavar='DIR',
+                        help='write every API call (without passwords) into'
+                             ' trace file of every worker in DIR, to be'
+                             ' replayed by replay')
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help='replay trace this many times faster than it was'
+                             ' recorded (default: %(default)s)')
+    parser.add_argument('--replay-threads', type=int,
+                        help='number of threads replaying sessions of trace'
+                             ' (default: number of workers which recorded'
+                             ' the trace)')
+    parser.add_argument('--credential', action='append', default=[],
+                        metavar='USER=PASSWORD',
+                        help='password of user logging in in replayed trace'
+                             ' (besides given admin and benchmark org admin),'
+                             ' can be given multiple times')
+    parser.add_argument('--sample', type=sample_size, metavar='N|FRACTION',
+                        help='in run, sweep and rate, make detail calls'
+                             ' (e.g. packages.getDetails) only for random'
+                             ' sample of N items (or FRACTION of them, like'
+                             ' 0.1) of every list')
+    parser.add_argument('--seed', type=int,
+                        help='seed of random sampling, for reproducible'
+                             ' samples')
+    parser.add_argument('--keep-cache', action='store_true',
+                        help='do not remove package build cache in cleanup')
+    args = parser.parse_args()
+    if args.arguments[0] in OFFLINE_ACTIONS:
+        args.username = args.password = args.hostname = None
+        args.action = args.arguments[0]
+        args.params = args.arguments[1:]
+    elif len(args.arguments) >= 4:
+        args.username, args.password, args.hostname, args.action = args.arguments[:4]
+        args.params = args.arguments[4:]
+    else:
+        parser.error('username, password, hostname and action are required')
+    return args
 
 
 def main():
     """Main"""
     # Load params
-    username = sys.argv[1]
-    password = sys.argv[2]
-    hostname = sys.argv[3]
-    action = sys.argv[4]
+    args = parse_args()
+    username = args.username
+    password = args.password
+    hostname = args.hostname
+    action = args.action
+    sizes = {}
+    for item in args.size:
+        entity, count = item.split('=')
+        sizes[entity] = int(count)
+    kwargs = {'connection': args.connection,
+              'scheme': args.scheme,
+              'build_procs': args.build_procs,
+              'build_cache': args.build_cache,
+              'push_batch': args.push_batch,
+              'push_procs': args.push_procs,
+              'setup_procs': args.setup_procs,
+              'register_procs': args.register_procs,
+              'multicall': args.multicall,
+              'rate_threads': args.rate_threads,
+              'replay_threads': args.replay_threads,
+              'duration': args.duration,
+              'warmup': args.warmup,
+              'steady_window': args.steady_window,
+              'steady_cv': args.steady_cv,
+              'stop_on_steady': args.stop_on_steady,
+              'workload': args.workload,
+              'sizes': satellite_api_benchmark.dataset_sizes(args.scale, **sizes),
+              'trace_dir': args.record_trace,
+              'credentials': dict(i.split('=', 1) for i in args.credential),
+              'sample': args.sample,
+              'seed': args.seed}
 
     # What are we going to do?
     if action == 'check':
-        check(username, password, hostname)
+        check(username, password, hostname, **kwargs)
         print "CHECK PASSED"
     elif action == 'setup':
-        out = setup(username, password, hostname)
+        out, actions = setup(username, password, hostname, **kwargs)
+        print_results([actions])
         print "CREATED %s" % ','.join([str(i) for i in out])
     elif action == 'run':
         try:
-            procs = int(sys.argv[5])
+            procs = int(args.params[0])
         except IndexError:
             procs = 1
-        # Run without multiprocessing module when number of procs is default
-        # 1 as it makes it easier to see tracebacks
-        if procs > 1:
-            results = []
-            # Define process pools and start processes
-            pool = multiprocessing.Pool(processes=procs)
-            for i in range(procs):
-                results.append(
-                    pool.apply_async(
-                        run,
-                        (username, password, hostname)
-                    )
-                )
-            # Do not allow submitting more processes and wait for workers to exit
-            pool.close()
-            pool.join()
-            # Get the results
-            results_out = []
-            for result in results:
-                results_out.append(result.get())
-            print_results(results_out)
-        else:
-            result = run(username, password, hostname)
-            print_results([result])
+        results_dir = args.results_dir or time.strftime('results-%Y%m%d-%H%M%S')
+        print "RESULTS DIR %s" % results_dir
+        sampler = None
+        if args.sample_interval:
+            if not os.path.isdir(results_dir):
+                os.makedirs(results_dir)
+            groups = [tuple(i.split('=', 1)) for i in args.sample_process]
+            sampler = satellite_api_benchmark.ProcessSampler(
+                results_dir, groups or None, args.sample_interval)
+            sampler.start()
+        aggregator = None
+        if args.live:
+            # Logging of every call would overwrite the live line, workers
+            # inherit the level
+            logging.getLogger().setLevel(logging.WARNING)
+        if args.live or args.csv or args.prometheus_file or args.prometheus_port:
+            aggregator = satellite_api_benchmark.RollingAggregator(
+                results_dir, args.interval, args.live, args.csv,
+                args.prometheus_file, args.prometheus_port)
+            aggregator.start()
+        try:
+            if args.agents:
+                request = {'procs': procs, 'username': username,
+                           'password': password, 'hostname': hostname,
+                           'pin_cpus': args.pin_cpus, 'kwargs': kwargs}
+                _, errors = satellite_api_benchmark.coordinate(
+                    args.agents, results_dir, request)
+                for error in errors:
+                    print "ERROR: %s" % error
+            else:
+                run_workers(procs, username, password, hostname, results_dir,
+                            pin_cpus=args.pin_cpus, **kwargs)
+        finally:
+            if sampler is not None:
+                sampler.stop()
+            if aggregator is not None:
+                aggregator.stop()
+        report(results_dir, args.whole_run)
+    elif action == 'sweep':
+        levels = [int(i) for i in args.params[0].split(',') if i != '']
+        results_dir = args.results_dir or time.strftime('results-%Y%m%d-%H%M%S')
+        print "RESULTS DIR %s" % results_dir
+        sweep(levels, args.sweep_warmup, args.sweep_repeats, args.knee,
+              username, password, hostname, results_dir,
+              pin_cpus=args.pin_cpus, **kwargs)
+    elif action == 'rate':
+        rates = [float(i) for i in args.params[0].split(',') if i != '']
+        results = run_rate(username, password, hostname, rates,
+                           args.rate_duration, **kwargs)
+        for actions in results:
+            print "RATE %s" % actions[0]['rate']
+            print_results([actions])
+            print
+        print_rates(results)
+    elif action == 'replay':
+        actions = replay(username, password, hostname, args.params[0],
+                         args.speed, **kwargs)
+        print_results([actions])
+        print "REPLAYED %s calls at %sx speed, max lag %.3f s" \
+            % (sum([a['repeats'] for a in actions]), args.speed,
+               max([a['lag'] for a in actions]))
+    elif action == 'register':
+        try:
+            count = int(args.params[0])
+        except IndexError:
+            count = 1000
+        actions = register(username, password, hostname, count, **kwargs)
+        print_results([actions])
+        for a in actions:
+            if a['method'] == 'registration.new_system_user_pass':
+                print "REGISTERED %s %s/s" % (a['repeats'], a['repeats'] / (a['end'] - a['start']))
+    elif action == 'checkin':
+        try:
+            profiles = profile_list(args.params[0])
+        except IndexError:
+            profiles = [satellite_api_benchmark.PROFILE]
+        actions = checkin(username, password, hostname, profiles,
+                          args.checkin_systems, **kwargs)
+        print_checkin(actions)
+    elif action == 'report':
+        report(args.params[0], args.whole_run)
+    elif action == 'compare':
+        if compare(args.params[0], args.params[1], args.threshold,
+                   args.alpha, args.bootstrap, args.whole_run):
+            return 1
+    elif action == 'agent':
+        try:
+            port = int(args.params[0])
+        except IndexError:
+            port = satellite_api_benchmark.AGENT_PORT
+        satellite_api_benchmark.serve_agent(run_workers, port)
     elif action == 'cleanup':
-        orgs = [int(i) for i in sys.argv[5].split(',') if i != '']
-        cleanup(username, password, hostname, orgs)
+        orgs = [int(i) for i in args.params[0].split(',') if i != '']
+        cleanup(username, password, hostname, orgs, args.keep_cache, **kwargs)
     else:
         print "ERROR: Unknown action"
         return 1
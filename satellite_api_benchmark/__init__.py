@@ -5,4 +5,16 @@
    API performance."""
 
 import config
-from satellite5 import Satellite5
+from satellite5 import Satellite5, BUILD_CACHE, DATASET, dataset_sizes
+from histogram import Histogram
+from transport import CONNECTION_MODES, PHASES
+from results import load_results, load_usage, results_files, \
+    concurrent_window, mark_run, load_run
+from workload import load_workload, shipped_workloads
+from sampler import ProcessSampler, PROCESS_GROUPS, load_samples
+from timeline import RollingAggregator
+from compare import compare, method_histograms
+from traces import load_trace
+from distributed import coordinate, serve_agent, AGENT_PORT
+from profiles import PROFILE, package_profile, updated_package_profile, \
+    hardware_profile, scaling_exponent
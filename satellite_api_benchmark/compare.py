@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+"""Statistical comparison of latencies of two benchmark results. Latency
+   distributions of every method are compared by Mann-Whitney U test and
+   change of average latency gets bootstrap confidence interval. Both work
+   on histogram buckets, so no individual durations are needed."""
+
+import math
+import random
+
+from histogram import Histogram
+
+
+def method_histograms(results):
+    """Return dict with histogram of every method merged over all
+       measurements in results (iterable of iterables of measurements)"""
+    out = {}
+    for actions in results:
+        for r in actions:
+            if r['method'] not in out:
+                out[r['method']] = Histogram()
+            out[r['method']].merge(r['histogram'])
+    return out
+
+
+def mann_whitney(old, new):
+    """Return two sided p-value of Mann-Whitney U test (normal
+       approximation with tie correction) that latencies of both
+       histograms come from the same distribution"""
+    counts = {}   # bucket value: [old count, new count]
+    for i, histogram in enumerate([old, new]):
+        for value, count in histogram.buckets():
+            counts.setdefault(value, [0, 0])[i] += count
+    n_old, n_new = old.count, new.count
+    n = n_old + n_new
+    rank = 0   # ranks taken by smaller values
+    rank_sum = 0.0   # of new values
+    ties = 0.0
+    for value in sorted(counts):
+        c_old, c_new = counts[value]
+        tied = c_old + c_new
+        rank_sum += c_new * (rank + (tied + 1) / 2.0)
+        ties += tied ** 3 - tied
+        rank += tied
+    u = rank_sum - n_new * (n_new + 1) / 2.0
+    mean = n_old * n_new / 2.0
+    variance = n_old * n_new / 12.0 * ((n + 1) - ties / (n * (n - 1)))
+    if variance <= 0:
+        return 1.0   # all values are the same
+    z = (abs(u - mean) - 0.5) / math.sqrt(variance)
+    return math.erfc(max(z, 0) / math.sqrt(2))
+
+
+def _binomial(rng, n, p):
+    """Return random number of successes in n trials with success
+       probability p. Normal approximation is used when variance is big
+       enough, otherwise successes are counted by skipping geometrically
+       distributed runs of failures, so it takes O(min(np, n(1-p)))."""
+    if n <= 0 or p <= 0:
+        return 0
+    if p >= 1:
+        return n
+    variance = n * p * (1 - p)
+    if variance >= 25:
+        k = int(round(rng.gauss(n * p, math.sqrt(variance))))
+        return min(max(k, 0), n)
+    if p > 0.5:
+        return n - _binomial(rng, n, 1 - p)
+    log_q = math.log(1 - p)
+    count = 0
+    position = 0
+    while True:
+        position += int(math.log(1 - rng.random()) / log_q) + 1
+        if position > n:
+            return count
+        count += 1
+
+
+def _resampler(histogram, rng):
+    """Return function returning average of random sample (with
+       replacement) of histogram values of the same size as histogram.
+       Bucket counts of the sample are drawn from multinomial distribution,
+       so it takes time proportional to number of buckets, not of values."""
+    buckets = histogram.buckets()
+    total = sum([count for _, count in buckets])
+
+    def resample():
+        remaining = total
+        mass = float(total)   # of buckets not drawn yet
+        out = 0.0
+        for value, count in buckets:
+            if remaining == 0:
+                break
+            k = _binomial(rng, remaining, count / mass)
+            out += k * value
+            remaining -= k
+            mass -= count
+        return out / total
+    return resample
+
+
+def bootstrap_change(old, new, iterations=200, confidence=0.95, seed=0):
+    """Return (low, high) bootstrap confidence interval of relative change
+       of average latency from old to new histogram"""
+    rng = random.Random(seed)
+    old_mean = _resampler(old, rng)
+    new_mean = _resampler(new, rng)
+    changes = sorted(new_mean() / old_mean() - 1 for i in range(iterations))
+    tail = (1 - confidence) / 2
+    return (changes[int(tail * (iterations - 1))],
+            changes[int((1 - tail) * (iterations - 1))])
+
+
+def compare(old, new, threshold=0.1, alpha=0.01, iterations=200,
+            min_count=5):
+    """Compare dicts of per method histograms, return list of dicts with
+       comparison of every method present in both. Method regressed when
+       its latency distribution differs significantly (p-value below alpha)
+       and its average latency grew by more than threshold."""
+    out = []
+    for method in sorted(set(old) & set(new)):
+        h_old, h_new = old[method], new[method]
+        row = {'method': method, 'old': h_old, 'new': h_new,
+               'change': h_new.mean() / h_old.mean() - 1,
+               'p': None, 'ci': (None, None), 'verdict': ''}
+        if h_old.count >= min_count and h_new.count >= min_count:
+            row['p'] = mann_whitney(h_old, h_new)
+            row['ci'] = bootstrap_change(h_old, h_new, iterations)
+            if row['p'] < alpha:
+                if row['change'] > threshold:
+                    row['verdict'] = 'REGRESSION'
+                elif row['change'] < -threshold:
+                    row['verdict'] = 'improvement'
+        out.append(row)
+    return out
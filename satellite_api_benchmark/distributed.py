@@ -0,0 +1,218 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+"""Load generation from multiple hosts. Agents listen on TCP port, the
+   coordinator connects to all of them and sends them the run request
+   (prepare), waits until workers of all of them logged in and only then
+   tells them to start, so all agents start measuring at once. Agents run
+   workers as usual and stream lines of their results files back,
+   coordinator writes them into its results directory as results of its
+   own workers. Agents convert times of measurements to clock of the
+   coordinator, which tells them its time with start. When any agent is not
+   ready, all of them are told to abort. Messages are JSON objects, one per
+   line. Credentials are sent in plain text, so use it on trusted network
+   only."""
+
+import os
+import json
+import time
+import shutil
+import socket
+import tempfile
+import threading
+import logging
+import multiprocessing
+
+from results import ResultsFollower, mark_run
+
+
+logger = logging.getLogger(__name__)
+
+AGENT_PORT = 9400
+POLL_INTERVAL = 0.2
+
+
+def _send(connection, message):
+    connection.sendall(json.dumps(message) + '\n')
+
+
+def _receive(reader):
+    """Return next message or None when connection is closed"""
+    line = reader.readline()
+    if not line:
+        return None
+    return json.loads(line)
+
+
+def _shift(line, offset):
+    """Return results line with times of measurement moved by offset"""
+    try:
+        record = json.loads(line)
+    except ValueError:
+        return line   # sent as is, reading results skips it
+    if 'type' in record or not offset:
+        return line
+    record['start'] += offset
+    record['end'] += offset
+    return json.dumps(record)
+
+
+def serve_agent(run_workers, port=AGENT_PORT, host=''):
+    """Serve coordinators one by one forever. run_workers(procs, username,
+       password, hostname, results_dir, pin_cpus, ready_callback, **kwargs)
+       runs the workers and calls ready_callback once all of them logged
+       in."""
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    server.bind((host, port))
+    server.listen(1)
+    logger.info("Agent listening on port %s", port)
+    while True:
+        connection, address = server.accept()
+        logger.info("Coordinator %s:%s connected", *address)
+        try:
+            _agent_session(connection, run_workers)
+        except (socket.error, ValueError), e:
+            logger.warning("Session with coordinator failed: %s", e)
+        finally:
+            connection.close()
+
+
+def _agent_session(connection, run_workers):
+    """Prepare, wait for start, run workers and stream their results"""
+    reader = connection.makefile('r')
+    request = _receive(reader)
+    if request is None or request.get('command') != 'prepare':
+        raise ValueError("Expected prepare, got %s" % request)
+    results_dir = tempfile.mkdtemp(prefix='agent-results-')
+    try:
+        outcome = {}
+        lock = threading.Lock()   # ready() sends from the run thread
+
+        def send(message):
+            with lock:
+                _send(connection, message)
+
+        def ready():
+            """Report logged in workers, wait for start of all agents"""
+            send({'status': 'ready', 'agent': socket.gethostname(),
+                  'procs': request['procs'],
+                  'cpus': multiprocessing.cpu_count()})
+            start = _receive(reader)
+            if start is not None and start.get('command') == 'abort':
+                raise ValueError("Aborted by coordinator")
+            if start is None or start.get('command') != 'start':
+                raise ValueError("Expected start, got %s" % start)
+            # Clocks of hosts differ, measurements have to be comparable
+            # with the window coordinator marked (up to network latency)
+            outcome['offset'] = start.get('time', time.time()) - time.time()
+
+        def run():
+            try:
+                outcome['wall'] = run_workers(
+                    request['procs'], request['username'],
+                    request['password'], request['hostname'], results_dir,
+                    request.get('pin_cpus'), ready, **request['kwargs'])
+            except Exception, e:
+                logger.exception("Run failed")
+                outcome['error'] = "%s: %s" % (e.__class__.__name__, e)
+
+        logger.info("Starting %s workers", request['procs'])
+        thread = threading.Thread(target=run, name='AgentRun')
+        thread.start()
+        follower = ResultsFollower(results_dir)
+        while thread.is_alive():
+            thread.join(POLL_INTERVAL)
+            # Logins are recorded before start, wait for the offset
+            if 'offset' not in outcome:
+                continue
+            for path, line in follower.lines():
+                send({'file': os.path.basename(path),
+                      'line': _shift(line, outcome['offset'])})
+        for path, line in follower.lines():
+            send({'file': os.path.basename(path),
+                  'line': _shift(line, outcome.get('offset', 0))})
+        send(dict(outcome, status='done'))
+        logger.info("Run finished")
+    finally:
+        shutil.rmtree(results_dir)
+
+
+def coordinate(agents, results_dir, request):
+    """Run request (procs, username, password, hostname, pin_cpus and
+       kwargs for workers) on all agents given as host:port at once, write
+       their results into results_dir. Return wall time of the run and list
+       of errors of failed agents. Agents already prepared are told to
+       abort when any agent fails to get ready."""
+    if not os.path.isdir(results_dir):
+        os.makedirs(results_dir)
+    sessions = []
+    cpus = 0
+    started = False
+    try:
+        for i, agent in enumerate(agents):
+            host, _, port = agent.rpartition(':')
+            connection = socket.create_connection((host, int(port)))
+            sessions.append((agent, connection, connection.makefile('r')))
+            kwargs = request['kwargs']
+            # Workers of different agents have to sample different items too
+            if kwargs.get('seed') is not None:
+                kwargs = dict(kwargs, seed=kwargs['seed'] + i * request['procs'])
+            _send(connection, dict(request, kwargs=kwargs, command='prepare'))
+        # Workers of all agents have to log in before any starts measuring
+        for agent, connection, reader in sessions:
+            reply = _receive(reader)
+            assert reply is not None and reply.get('status') == 'ready', \
+                "Agent %s is not ready: %s" % (agent, reply)
+            logger.info("Agent %s (%s) ready", agent, reply['agent'])
+            cpus += reply.get('cpus', 0)
+        start = time.time()
+        for agent, connection, reader in sessions:
+            _send(connection, {'command': 'start', 'time': start})
+        started = True
+    finally:
+        if not started:
+            for agent, connection, _ in sessions:
+                try:
+                    _send(connection, {'command': 'abort'})
+                except socket.error, e:
+                    logger.warning("Can not abort agent %s: %s", agent, e)
+                connection.close()
+    # CPU share of workers is reported against CPUs of all agents
+    mark_run(results_dir, released=start, cpus=cpus or None)
+    errors = []
+
+    def collect(i, agent, reader):
+        """Write results streamed by agent until it is done"""
+        files = {}
+        try:
+            while True:
+                message = _receive(reader)
+                if message is None:
+                    errors.append("Agent %s closed connection" % agent)
+                    break
+                if 'line' in message:
+                    name = message['file']
+                    if name not in files:
+                        # Keep worker-*.jsonl naming for results_files()
+                        files[name] = open(os.path.join(
+                            results_dir, 'worker-agent%s-%s' % (i, name[7:])), 'w')
+                    files[name].write(message['line'] + '\n')
+                    files[name].flush()
+                elif message.get('status') == 'done':
+                    if message.get('error'):
+                        errors.append("Agent %s: %s" % (agent, message['error']))
+                    break
+        finally:
+            for f in files.values():
+                f.close()
+
+    threads = [threading.Thread(target=collect, args=(i, agent, reader))
+               for i, (agent, _, reader) in enumerate(sessions)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for _, connection, _ in sessions:
+        connection.close()
+    return time.time() - start, errors
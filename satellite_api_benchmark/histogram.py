@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+"""Compact, mergeable latency histogram in the spirit of HdrHistogram.
+
+   Durations are stored in microseconds in log-linear buckets: values below
+   2 * SUB_BUCKET_HALF land in their own bucket, larger values share buckets
+   whose width grows with the magnitude of the value, so relative error stays
+   below 1 / SUB_BUCKET_HALF. Only non-empty buckets are kept (sparse dict),
+   so histograms are cheap to pickle between multiprocessing workers."""
+
+import math
+
+SUB_BUCKET_BITS = 7
+SUB_BUCKET_HALF = 1 << SUB_BUCKET_BITS
+UNIT = 1000000.0   # values are recorded in seconds, stored in microseconds
+
+
+def _index(value):
+    """Return bucket index for given value in microseconds"""
+    if value < 2 * SUB_BUCKET_HALF:
+        return value
+    shift = value.bit_length() - SUB_BUCKET_BITS - 1
+    return shift * SUB_BUCKET_HALF + (value >> shift)
+
+
+def _bounds(index):
+    """Return (lowest, highest) value in microseconds of given bucket"""
+    if index < 2 * SUB_BUCKET_HALF:
+        return index, index
+    shift = index // SUB_BUCKET_HALF - 1
+    mantissa = index - shift * SUB_BUCKET_HALF
+    return mantissa << shift, ((mantissa + 1) << shift) - 1
+
+
+class Histogram(object):
+    """Latency histogram with percentiles, min, max, exact average and
+       standard deviation"""
+
+    def __init__(self):
+        self.counts = {}
+        self.count = 0
+        self.total = 0.0
+        self.total_sq = 0.0   # None when merged with histogram without it
+        self.min = None
+        self.max = None
+
+    def record(self, duration):
+        """Record one duration given in seconds"""
+        value = max(int(round(duration * UNIT)), 0)
+        index = _index(value)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.total += duration
+        self.total_sq += duration * duration
+        if self.min is None or duration < self.min:
+            self.min = duration
+        if self.max is None or duration > self.max:
+            self.max = duration
+
+    def merge(self, other):
+        """Add all values recorded in other histogram to this one"""
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.count += other.count
+        self.total += other.total
+        if self.total_sq is None or other.total_sq is None:
+            self.total_sq = None
+        else:
+            self.total_sq += other.total_sq
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+        if other.max is not None and (self.max is None or other.max > self.max):
+            self.max = other.max
+        return self
+
+    def mean(self):
+        """Return exact average of recorded durations"""
+        if self.count == 0:
+            return None
+        return self.total / self.count
+
+    def stdev(self):
+        """Return sample standard deviation of recorded durations"""
+        if self.count < 2 or self.total_sq is None:
+            return None
+        variance = (self.total_sq - self.total * self.total / self.count) \
+            / (self.count - 1)
+        return math.sqrt(max(variance, 0.0))
+
+    def mean_ci(self, z=1.96):
+        """Return half width of confidence interval of the average (95% by
+           default) using normal approximation"""
+        stdev = self.stdev()
+        if stdev is None:
+            return None
+        return z * stdev / math.sqrt(self.count)
+
+    def percentile_ci(self, percentile, z=1.96):
+        """Return (low, high) distribution free confidence interval of given
+           percentile, values at ranks given by normal approximation of
+           binomial distribution"""
+        if self.count == 0:
+            return None, None
+        p = percentile / 100.0
+        spread = z * math.sqrt(self.count * p * (1 - p))
+        low = max(p * self.count - spread, 0) * 100.0 / self.count
+        high = min(p * self.count + spread + 1, self.count) * 100.0 / self.count
+        return self.percentile(low), self.percentile(high)
+
+    def percentile(self, percentile):
+        """Return value (in seconds) below which given percentage of
+           recorded durations falls"""
+        if self.count == 0:
+            return None
+        rank = max(percentile / 100.0 * self.count, 1)
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                lowest, highest = _bounds(index)
+                value = (lowest + highest) / 2.0 / UNIT
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def buckets(self):
+        """Return list of (value in seconds, count) of non-empty buckets in
+           ascending order, value being the middle of the bucket"""
+        out = []
+        for index in sorted(self.counts):
+            lowest, highest = _bounds(index)
+            out.append(((lowest + highest) / 2.0 / UNIT, self.counts[index]))
+        return out
+
+    def to_dict(self):
+        """Return histogram as dict which can be serialized to JSON"""
+        return {'counts': sorted(self.counts.items()),
+                'count': self.count,
+                'total': self.total,
+                'total_sq': self.total_sq,
+                'min': self.min,
+                'max': self.max}
+
+    @classmethod
+    def from_dict(cls, data):
+        """Create histogram from dict returned by to_dict()"""
+        histogram = cls()
+        histogram.counts = dict((int(i), c) for i, c in data['counts'])
+        histogram.count = data['count']
+        histogram.total = data['total']
+        histogram.total_sq = data.get('total_sq')
+        histogram.min = data['min']
+        histogram.max = data['max']
+        return histogram
@@ -0,0 +1,621 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+"""Local stand-in for Red Hat Satellite 5 XML-RPC server. It implements
+   /rpc/api and /XMLRPC methods used by Satellite5 check, setup, run and
+   register with payloads shaped like real Satellite ones and with
+   configurable service time, so overhead of the benchmark client itself
+   can be measured without a Satellite. Package uploads done by rhnpush
+   (/APP handler) are not emulated, packages.findByNvrea returns packages
+   as if they were pushed."""
+
+import sys
+import time
+import random
+import argparse
+import threading
+import logging
+
+import xmlrpclib
+import SocketServer
+from SimpleXMLRPCServer import MultiPathXMLRPCServer, \
+    SimpleXMLRPCRequestHandler, SimpleXMLRPCDispatcher
+if sys.version_info >= (2, 7, 9):
+    import ssl
+
+
+logger = logging.getLogger(__name__)
+
+SYSTEM_ENTITLEMENTS = ['enterprise_entitled', 'provisioning_entitled',
+                       'monitoring_entitled', 'virtualization_host',
+                       'virtualization_host_platform']
+CHANNEL_FAMILIES = ['rhel-server', 'rhel-server-6', 'rhel-server-7',
+                    'rhel-client', 'rhel-client-6', 'rhel-client-7']
+ENTITLEMENTS_TOTAL = 100000
+# Namespaces of API calls, only methods of MockSatellite starting with them
+# can be called over XML-RPC
+NAMESPACES = ['auth', 'org', 'user', 'channel', 'packages', 'errata',
+              'activationkey', 'system', 'registration']
+
+
+def _date(offset=0):
+    """Return XML-RPC date offset seconds in the past"""
+    return xmlrpclib.DateTime(time.gmtime(time.time() - offset))
+
+
+class MockSatellite(object):
+    """In-memory model of Satellite content. Methods named like API calls
+       with dots replaced by underscores implement the calls."""
+
+    def __init__(self, populated=True, orgs=100, users=100, channels=100,
+                 packages=500, errata=200, activationkeys=100, systems=1000,
+                 service_time=0.0, jitter=0.0, method_times=None, seed=None):
+        self.service_time = service_time
+        self.jitter = jitter
+        self.method_times = method_times or {}
+        self.random = random.Random(seed)
+        self.random_lock = threading.Lock()   # server threads share it
+        self.lock = threading.Lock()
+        self.sessions = {}   # key: (login, org id)
+        self.orgs = {}   # id: org
+        self.users = {}   # login: user
+        self.channels = {}   # label: channel
+        self.packages = {}   # id: package
+        self.errata = {}   # advisory name: errata
+        self.activationkeys = {}   # key: activation key
+        self.systems = {}   # id: system
+        self.next_id = 1000
+        self.methods = {}   # implementations of API calls by name
+        for name in dir(self):
+            namespace, _, call = name.partition('_')
+            if namespace in NAMESPACES and call and callable(getattr(self, name)):
+                self.methods[name] = getattr(self, name)
+        self._create_org('Satellite Org', 'admin', 'password')
+        if populated:
+            self.populate(orgs, users, channels, packages, errata,
+                          activationkeys, systems)
+
+    def _draw(self, name, *args):
+        """Return result of given method of self.random, so draws of
+           concurrent calls do not interfere"""
+        with self.random_lock:
+            return getattr(self.random, name)(*args)
+
+    def _id(self):
+        """Return new unique ID"""
+        with self.lock:
+            self.next_id += 1
+            return self.next_id
+
+    def populate(self, orgs, users, channels, packages, errata,
+                 activationkeys, systems):
+        """Create content Satellite5.setup() would create"""
+        logger.info("Populating mock with %s orgs, %s users, %s channels,"
+                    " %s packages, %s erratas, %s activation keys and %s"
+                    " systems", orgs, users, channels, packages * 2, errata,
+                    activationkeys, systems)
+        for i in range(orgs):
+            self._create_org('benchmark-org-%s' % i,
+                             'benchmark-org-%s-admin' % i,
+                             'benchmark-org-%s-pass' % i)
+        org_id = self.orgs.keys()[0]
+        for org in self.orgs.values():
+            if org['name'] == 'benchmark-org-0':
+                org_id = org['id']
+        for i in range(users):
+            self._create_user(org_id, 'benchmark-org-0-user-%s' % i,
+                              'benchmark-org-0-pass-%s' % i,
+                              'Us%s' % i, 'Er%s' % i, 'root@localhost')
+        for i in range(channels):
+            self._create_channel(org_id, 'benchmark-org-0-channel-%s' % i)
+        for i in range(packages):
+            for version in ['0.1', '0.2']:
+                self._create_package('benchmark-org-0-channel-0',
+                                     'benchmark-org-0-package-%s' % i,
+                                     version, '1', '', 'x86_64')
+        for i in range(min(errata, packages)):
+            pid = self._find_package('benchmark-org-0-package-%s' % i,
+                                     '0.2', '1')
+            self._create_errata(org_id, {
+                'synopsis': 'Fake advisory in org 0 channel 0 for package %i' % i,
+                'advisory_name': 'benchmark-org-0-channel-0-package-%s' % i,
+                'advisory_release': 1,
+                'advisory_type': 'Bug Fix Advisory',
+                'product': 'Fake product'}, [pid],
+                ['benchmark-org-0-channel-0'])
+        keys = [self._create_activationkey(org_id, 'Benchmark AK %s' % i,
+                                           'benchmark-org-0-channel-%s' % i)
+                for i in range(activationkeys)]
+        installed = [{'name': 'package%s' % i, 'version': '1.2',
+                      'release': '3', 'epoch': '', 'arch': 'x86_64'}
+                     for i in range(950)]
+        installed += [{'name': 'benchmark-org-0-package-%s' % i,
+                       'version': '0.1', 'release': '1', 'epoch': '',
+                       'arch': 'x86_64'}
+                      for i in range(min(50, packages))]
+        for i in range(systems):
+            self._create_system(org_id, 'System %s' % i, keys[0] if keys else None,
+                                installed)
+
+    # Model helpers
+
+    def _create_org(self, name, login, password):
+        org_id = 1 if not self.orgs else self._id()
+        self.orgs[org_id] = {
+            'id': org_id, 'name': name, 'active_users': 1, 'systems': 0,
+            'trusts': 0, 'system_groups': 0, 'activation_keys': 0,
+            'kickstart_profiles': 0, 'configuration_channels': 0,
+            'system_entitlements': dict((e, 0) for e in SYSTEM_ENTITLEMENTS),
+            'software_entitlements': dict((f, 0) for f in CHANNEL_FAMILIES)}
+        self._create_user(org_id, login, password, 'Mark', 'Bench',
+                          'root@localhost', org_admin=True)
+        return self.orgs[org_id]
+
+    def _create_user(self, org_id, login, password, first, last, email,
+                     org_admin=False):
+        self.users[login] = {
+            'id': self._id(), 'login': login, 'login_uc': login.upper(),
+            'password': password, 'org_id': org_id, 'first_name': first,
+            'last_name': last, 'email': email, 'prefix': 'Mr.',
+            'enabled': True, 'use_pam': False, 'is_org_admin': org_admin,
+            'created_date': _date(86400), 'last_login_date': _date()}
+
+    def _create_channel(self, org_id, label, summary=None, arch='channel-x86_64',
+                        parent='', checksum='sha256', gpg=None):
+        gpg = gpg or {'url': '', 'id': '', 'fingerprint': ''}
+        self.channels[label] = {
+            'id': self._id(), 'label': label, 'name': label,
+            'summary': summary or label, 'description': '',
+            'org_id': org_id, 'arch_name': arch.replace('channel-', ''),
+            'parent_channel_label': parent, 'checksum_label': checksum,
+            'gpg_key_url': gpg['url'], 'gpg_key_id': gpg['id'],
+            'gpg_key_fp': gpg['fingerprint'], 'maintainer_name': '',
+            'maintainer_email': '', 'maintainer_phone': '',
+            'support_policy': '', 'end_of_life': '',
+            'last_modified': _date(), 'yumrepo_source_url': '',
+            'yumrepo_label': '', 'yumrepo_last_sync': '',
+            'packages': [], 'errata': []}
+
+    def _create_package(self, channel, name, version, release, epoch, arch):
+        pid = self._id()
+        self.packages[pid] = {
+            'id': pid, 'name': name, 'version': version, 'release': release,
+            'epoch': epoch, 'arch_label': arch,
+            'providing_channels': [channel],
+            'build_host': 'builder.example.com', 'build_date': _date(86400),
+            'description': 'This rpm is a very simple one. Just food for a channel.',
+            'summary': name, 'vendor': 'Benchmark', 'license': 'GPLv2',
+            'cookie': 'builder.example.com 1479466800',
+            'checksum': '%064x' % self._draw('getrandbits', 256),
+            'checksum_type': 'sha256', 'file': '%s-%s-%s.%s.rpm' % (name, version, release, arch),
+            'path': 'redhat/1/%s/%s-%s/%s/%s-%s-%s.%s.rpm' % (name, version, release, arch, name, version, release, arch),
+            'size': '5432', 'payload_size': '1234',
+            'last_modified_date': _date()}
+        self.channels[channel]['packages'].append(pid)
+        return pid
+
+    def _find_package(self, name, version, release):
+        for package in self.packages.values():
+            if (package['name'], package['version'], package['release']) == (name, version, release):
+                return package['id']
+        return None
+
+    def _create_errata(self, org_id, info, package_ids, channels):
+        name = info['advisory_name']
+        self.errata[name] = {
+            'id': self._id(), 'org_id': org_id,
+            'issue_date': '11/18/16', 'update_date': '11/18/16',
+            'last_modified_date': '2016-11-18 00:00:00',
+            'synopsis': info.get('synopsis', ''),
+            'release': info.get('advisory_release', 1),
+            'type': info.get('advisory_type', 'Bug Fix Advisory'),
+            'product': info.get('product', ''),
+            'errataFrom': info.get('errataFrom', ''),
+            'topic': info.get('topic', 'topic'),
+            'description': info.get('description', 'description'),
+            'references': info.get('references', 'references'),
+            'notes': info.get('notes', 'notes'),
+            'solution': info.get('solution', 'solution'),
+            'advisory_name': name, 'packages': package_ids}
+        for label in channels:
+            self.channels[label]['errata'].append(name)
+
+    def _create_activationkey(self, org_id, description, channel):
+        key = '%s-%032x' % (org_id, self._draw('getrandbits', 128))
+        self.activationkeys[key] = {
+            'key': key, 'description': description,
+            'base_channel_label': channel, 'child_channel_labels': [],
+            'entitlements': ['enterprise_entitled'],
+            'server_group_ids': [], 'package_names': [], 'packages': [],
+            'universal_default': False, 'usage_limit': 0,
+            'disabled': False, 'contact_method': 'default',
+            'org_id': org_id}
+        return key
+
+    def _create_system(self, org_id, name, key, packages):
+        sid = self._id()
+        installed = set((p['name'], p['version'], p['release']) for p in packages)
+        self.systems[sid] = {
+            'id': sid, 'profile_name': name, 'org_id': org_id,
+            'base_entitlement': 'enterprise_entitled',
+            'addon_entitlements': [], 'auto_update': False,
+            'release': '6Server', 'address1': '', 'address2': '',
+            'city': '', 'state': '', 'country': '', 'building': '',
+            'room': '', 'rack': '', 'description': 'Initial Registration Parameters:\nOS: RHEL Server\nRelease: 6Server\nCPU Arch: x86_64',
+            'hostname': 'system.example.com', 'last_boot': _date(3600),
+            'osa_status': 'unknown', 'lock_status': False,
+            'virtualization': '', 'channel': self.activationkeys[key]['base_channel_label'] if key else '',
+            'last_checkin': _date(), 'packages': installed, 'hardware': []}
+        return sid
+
+    def _org_of(self, key):
+        try:
+            return self.sessions[key][1]
+        except KeyError:
+            raise xmlrpclib.Fault(2950, 'Either the password or username is incorrect.')
+
+    def _system_id(self, system_id):
+        """Return system ID from systemid 'certificate'"""
+        return int(system_id.split('ID-')[1].split('<')[0])
+
+    # Dispatching
+
+    def dispatch(self, method, params):
+        """Look up API method and call it, sleeping for its service time"""
+        fce = self.methods.get(method.replace('.', '_'))
+        if fce is None:
+            raise xmlrpclib.Fault(-1, 'Could not find method %s' % method)
+        service_time = self.method_times.get(method, self.service_time)
+        if service_time or self.jitter:
+            time.sleep(max(0.0, self._draw('gauss', service_time, self.jitter)))
+        return fce(*params)
+
+    # /rpc/api
+
+    def auth_login(self, login, password):
+        user = self.users.get(login)
+        if user is None or user['password'] != password:
+            raise xmlrpclib.Fault(2950, 'Either the password or username is incorrect.')
+        key = '%032x' % self._draw('getrandbits', 128)
+        self.sessions[key] = (login, user['org_id'])
+        return key
+
+    def auth_logout(self, key):
+        self.sessions.pop(key, None)
+        return 1
+
+    def _org(self, org):
+        out = dict((k, v) for k, v in org.items() if not k.endswith('entitlements'))
+        out['active_users'] = len([u for u in self.users.values() if u['org_id'] == org['id']])
+        out['systems'] = len([s for s in self.systems.values() if s['org_id'] == org['id']])
+        return out
+
+    def org_listOrgs(self, key):
+        self._org_of(key)
+        return [self._org(o) for o in sorted(self.orgs.values(), key=lambda o: o['id'])]
+
+    def org_getDetails(self, key, name):
+        self._org_of(key)
+        for org in self.orgs.values():
+            if org['name'] == name or org['id'] == name:
+                return self._org(org)
+        raise xmlrpclib.Fault(2850, 'No such org: %s' % name)
+
+    def org_create(self, key, name, login, password, prefix, first, last,
+                   email, pam):
+        self._org_of(key)
+        return self._org(self._create_org(name, login, password))
+
+    def org_delete(self, key, org_id):
+        self._org_of(key)
+        with self.lock:
+            self.orgs.pop(org_id, None)
+            for table in [self.users, self.channels, self.errata,
+                          self.activationkeys, self.systems]:
+                for k, v in table.items():
+                    if v.get('org_id') == org_id:
+                        del table[k]
+        return 1
+
+    def _entitlements(self, allocations, names=False):
+        out = []
+        for label, allocated in sorted(allocations.items()):
+            used = 0
+            if label == 'enterprise_entitled':
+                used = len(self.systems)
+            entitlement = {'label': label, 'allocated': allocated,
+                           'unallocated': ENTITLEMENTS_TOTAL - allocated,
+                           'used': min(used, allocated),
+                           'free': max(allocated - used, 0)}
+            if names:
+                entitlement['name'] = label.replace('_', ' ').title()
+            out.append(entitlement)
+        return out
+
+    def org_listSystemEntitlements(self, key):
+        self._org_of(key)
+        totals = dict((e, 0) for e in SYSTEM_ENTITLEMENTS)
+        for org in self.orgs.values():
+            if org['id'] != 1:
+                for label, allocated in org['system_entitlements'].items():
+                    totals[label] += allocated
+        return self._entitlements(totals, names=True)
+
+    def org_listSystemEntitlementsForOrg(self, key, org_id):
+        self._org_of(key)
+        return self._entitlements(self.orgs[org_id]['system_entitlements'])
+
+    def org_listSoftwareEntitlementsForOrg(self, key, org_id):
+        self._org_of(key)
+        out = self._entitlements(self.orgs[org_id]['software_entitlements'], names=True)
+        for entitlement in out:
+            entitlement['allocated_flex'] = 0
+            entitlement['unallocated_flex'] = 0
+            entitlement['free_flex'] = 0
+            entitlement['used_flex'] = 0
+        return out
+
+    def org_setSystemEntitlements(self, key, org_id, label, allocation):
+        self._org_of(key)
+        self.orgs[org_id]['system_entitlements'][label] = allocation
+        return 1
+
+    def org_setSoftwareEntitlements(self, key, org_id, label, allocation):
+        self._org_of(key)
+        self.orgs[org_id]['software_entitlements'][label] = allocation
+        return 1
+
+    def _user(self, user, keys):
+        return dict((k, user[k]) for k in keys)
+
+    def org_listUsers(self, key, org_id):
+        self._org_of(key)
+        return [dict(self._user(u, ['login', 'login_uc', 'email', 'id', 'is_org_admin']),
+                     name='%s, %s' % (u['last_name'], u['first_name']))
+                for u in self.users.values() if u['org_id'] == org_id]
+
+    def user_listUsers(self, key):
+        org_id = self._org_of(key)
+        return [self._user(u, ['id', 'login', 'login_uc', 'enabled'])
+                for u in self.users.values() if u['org_id'] == org_id]
+
+    def user_getDetails(self, key, login):
+        self._org_of(key)
+        return self._user(self.users[login], [
+            'first_name', 'last_name', 'email', 'org_id', 'prefix',
+            'last_login_date', 'created_date', 'enabled', 'use_pam'])
+
+    def user_create(self, key, login, password, first, last, email, pam=0):
+        org_id = self._org_of(key)
+        self._create_user(org_id, login, password, first, last, email)
+        return 1
+
+    def _channel(self, channel):
+        return {'id': channel['id'], 'label': channel['label'],
+                'name': channel['name'], 'provider_name': 'Benchmark',
+                'packages': len(channel['packages']),
+                'systems': len([s for s in self.systems.values() if s['channel'] == channel['label']]),
+                'arch_name': channel['arch_name'],
+                'parent_label': channel['parent_channel_label']}
+
+    def channel_listAllChannels(self, key):
+        self._org_of(key)
+        return [self._channel(c) for c in self.channels.values()]
+
+    def channel_listSoftwareChannels(self, key):
+        org_id = self._org_of(key)
+        return [self._channel(c) for c in self.channels.values() if c['org_id'] == org_id]
+
+    def channel_software_create(self, key, label, name, summary, arch,
+                                parent, checksum='sha256', gpg=None):
+        org_id = self._org_of(key)
+        self._create_channel(org_id, label, summary, arch, parent, checksum, gpg)
+        return 1
+
+    def channel_software_getDetails(self, key, label):
+        self._org_of(key)
+        channel = self.channels[label]
+        return dict((k, v) for k, v in channel.items() if k not in ('packages', 'errata', 'org_id'))
+
+    def channel_software_listAllPackages(self, key, label):
+        self._org_of(key)
+        return [dict((k, self.packages[pid][k]) for k in [
+                    'name', 'version', 'release', 'epoch', 'id',
+                    'arch_label', 'checksum', 'checksum_type',
+                    'last_modified_date'])
+                for pid in self.channels[label]['packages']]
+
+    def _errata(self, errata):
+        return {'id': errata['id'], 'date': errata['issue_date'],
+                'update_date': errata['update_date'],
+                'advisory_synopsis': errata['synopsis'],
+                'advisory_type': errata['type'],
+                'advisory_name': errata['advisory_name']}
+
+    def channel_software_listErrata(self, key, label):
+        self._org_of(key)
+        return [self._errata(self.errata[e]) for e in self.channels[label]['errata']]
+
+    def packages_getDetails(self, key, pid):
+        self._org_of(key)
+        return self.packages[pid]
+
+    def packages_findByNvrea(self, key, name, version, release, epoch, arch):
+        self._org_of(key)
+        pid = self._find_package(name, version, release)
+        if pid is None:
+            # rhnpush is not emulated, pretend the package was pushed
+            pid = self._create_package(sorted(self.channels)[0], name,
+                                       version, release, epoch, arch)
+        package = self.packages[pid]
+        return [dict((k, package[k]) for k in [
+            'name', 'version', 'release', 'epoch', 'id', 'arch_label',
+            'path', 'provider', 'last_modified'] if k in package)]
+
+    def errata_getDetails(self, key, name):
+        self._org_of(key)
+        return dict((k, v) for k, v in self.errata[name].items() if k not in ('packages', 'org_id', 'id', 'advisory_name'))
+
+    def errata_create(self, key, info, bugs, keywords, package_ids, publish,
+                      channels):
+        org_id = self._org_of(key)
+        self._create_errata(org_id, info, package_ids, channels)
+        return self._errata(self.errata[info['advisory_name']])
+
+    def activationkey_create(self, key, ak, description, channel,
+                             entitlements, universal_default):
+        org_id = self._org_of(key)
+        return self._create_activationkey(org_id, description, channel)
+
+    def activationkey_listActivationKeys(self, key):
+        org_id = self._org_of(key)
+        return [dict((k, v) for k, v in ak.items() if k != 'org_id')
+                for ak in self.activationkeys.values() if ak['org_id'] == org_id]
+
+    def system_listSystems(self, key):
+        org_id = self._org_of(key)
+        return [{'id': s['id'], 'name': s['profile_name'],
+                 'last_checkin': s['last_checkin']}
+                for s in self.systems.values() if s['org_id'] == org_id]
+
+    def system_getDetails(self, key, sid):
+        self._org_of(key)
+        return dict((k, v) for k, v in self.systems[sid].items() if k not in ('packages', 'hardware', 'org_id', 'channel', 'last_checkin'))
+
+    def system_getUnscheduledErrata(self, key, sid):
+        self._org_of(key)
+        installed = self.systems[sid]['packages']
+        out = []
+        for errata in self.errata.values():
+            for pid in errata['packages']:
+                package = self.packages.get(pid)
+                if package and (package['name'], '0.1', '1') in installed:
+                    out.append(self._errata(errata))
+                    break
+        return out
+
+    # /XMLRPC
+
+    def registration_new_system_user_pass(self, name, os_release,
+                                          release_version, arch, login,
+                                          password, other):
+        user = self.users.get(login)
+        if user is None or user['password'] != password:
+            raise xmlrpclib.Fault(-2, 'Invalid username/password combination')
+        key = other.get('token')
+        if key not in self.activationkeys:
+            raise xmlrpclib.Fault(-60, 'Could not find token %s' % key)
+        sid = self._create_system(self.activationkeys[key]['org_id'], name,
+                                  key, other.get('packages', []))
+        system_id = "<?xml version='1.0'?><params><param><value><struct>" \
+            "<member><name>system_id</name><value><string>ID-%s</string>" \
+            "</value></member></struct></value></param></params>" % sid
+        return {'system_id': system_id, 'failed_channels': []}
+
+    def registration_refresh_hw_profile(self, system_id, hardware):
+        self.systems[self._system_id(system_id)]['hardware'] = hardware
+        return 0
+
+    def registration_update_packages(self, system_id, packages):
+        self.systems[self._system_id(system_id)]['packages'] = set(
+            (p['name'], p['version'], p['release']) for p in packages)
+        return 0
+
+
+class RequestHandler(SimpleXMLRPCRequestHandler):
+    """Serve Satellite API paths over persistent HTTP/1.1 connections"""
+    rpc_paths = ('/rpc/api', '/XMLRPC')
+    protocol_version = 'HTTP/1.1'
+
+
+class MockServer(SocketServer.ThreadingMixIn, MultiPathXMLRPCServer):
+    """Threaded XML-RPC server dispatching to MockSatellite"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, satellite, certfile=None):
+        MultiPathXMLRPCServer.__init__(self, address,
+                                       requestHandler=RequestHandler,
+                                       logRequests=False, allow_none=True)
+        if certfile:
+            self.socket = ssl.wrap_socket(self.socket, certfile=certfile,
+                                          server_side=True)
+        for path in RequestHandler.rpc_paths:
+            dispatcher = SimpleXMLRPCDispatcher(allow_none=True, encoding=None)
+            dispatcher.register_multicall_functions()
+            dispatcher.register_instance(_Dispatcher(satellite))
+            self.add_dispatcher(path, dispatcher)
+
+
+class _Dispatcher(object):
+    """Adapter passing dotted method names to MockSatellite.dispatch()"""
+
+    def __init__(self, satellite):
+        self.satellite = satellite
+
+    def _dispatch(self, method, params):
+        return self.satellite.dispatch(method, params)
+
+
+def parse_args():
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(
+        description='Mock Red Hat Satellite 5 XML-RPC server')
+    parser.add_argument('--host', default='localhost',
+                        help='address to listen on (default: %(default)s)')
+    parser.add_argument('--port', type=int, default=8080,
+                        help='port to listen on (default: %(default)s)')
+    parser.add_argument('--certfile',
+                        help='PEM file with certificate and key to serve'
+                             ' https instead of http')
+    parser.add_argument('--empty', action='store_true',
+                        help='start empty as required by check and setup'
+                             ' instead of with content created by setup')
+    for entity, default in [('orgs', 100), ('users', 100), ('channels', 100),
+                            ('packages', 500), ('errata', 200),
+                            ('activationkeys', 100), ('systems', 1000)]:
+        parser.add_argument('--%s' % entity, type=int, default=default,
+                            help='number of %s to create (default:'
+                                 ' %%(default)s)' % entity)
+    parser.add_argument('--service-time', type=float, default=0.0,
+                        help='mean seconds every call takes'
+                             ' (default: %(default)s)')
+    parser.add_argument('--jitter', type=float, default=0.0,
+                        help='standard deviation of service time in seconds'
+                             ' (default: %(default)s)')
+    parser.add_argument('--method-time', action='append', default=[],
+                        metavar='METHOD=SECONDS',
+                        help='mean service time of given method, can be'
+                             ' given multiple times')
+    parser.add_argument('--seed', type=int,
+                        help='seed of random generator for reproducible'
+                             ' content and jitter')
+    return parser.parse_args()
+
+
+def main():
+    """Main"""
+    args = parse_args()
+    method_times = {}
+    for item in args.method_time:
+        method, seconds = item.split('=')
+        method_times[method] = float(seconds)
+    satellite = MockSatellite(
+        populated=not args.empty, orgs=args.orgs, users=args.users,
+        channels=args.channels, packages=args.packages, errata=args.errata,
+        activationkeys=args.activationkeys, systems=args.systems,
+        service_time=args.service_time, jitter=args.jitter,
+        method_times=method_times, seed=args.seed)
+    server = MockServer((args.host, args.port), satellite, args.certfile)
+    logger.info("Serving mock Satellite on %s://%s:%s, admin login is"
+                " 'admin' with password 'password'",
+                'https' if args.certfile else 'http', args.host, args.port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+"""Generated client profiles of registered systems: installed packages and
+   hardware (devices, disks and network interfaces) of tunable size, so
+   cost of processing profiles on the server can be measured against size
+   of the payload."""
+
+import math
+import xmlrpclib
+
+
+# Numbers of packages, devices (including disks) and network interfaces of
+# generated profile by default
+PROFILE = {'packages': 1000, 'devices': 60, 'interfaces': 4}
+
+# (bus, driver, class, description) of generated devices, used in turn
+DEVICES = [
+    ('pci', 'pcieport', 'OTHER', 'Intel Corporation|PCI Express Root Port'),
+    ('pci', 'ehci-pci', 'USB', 'Intel Corporation|USB2 Enhanced Host Controller'),
+    ('pci', 'ahci', 'OTHER', 'Intel Corporation|6 port SATA AHCI Controller'),
+    ('usb', 'hub', 'OTHER', 'USB Hub Interface'),
+    ('usb', 'usbhid', 'OTHER', 'USB HID Interface'),
+    ('scsi', 'sd', 'SCSI', ''),
+    ('ata', 'unknown', 'HD', 'HITACHI_HTS725050A9A364'),
+    ('pci', 'e1000e', 'OTHER', 'Intel Corporation|82577LM Gigabit Network Connection'),
+]
+
+
+def package_profile(count, applicable=0):
+    """Return list of count installed packages, the last applicable of them
+       are old versions of benchmark packages which make erratas
+       applicable, the rest is random payload"""
+    packages = []
+    for i in range(count - applicable):
+        packages.append({'name': 'package%s' % i,
+                         'version': '1.2',
+                         'release': '3',
+                         'epoch': '',
+                         'arch': 'x86_64'})
+    for i in range(applicable):
+        packages.append({'name': 'benchmark-org-0-package-%s' % i,
+                         'version': '0.1',
+                         'release': '1',
+                         'epoch': '',
+                         'arch': 'x86_64'})
+    return packages
+
+
+def updated_package_profile(packages, update=1):
+    """Return copy of package profile as after system update: release of
+       every random payload package is raised by update, old versions of
+       benchmark packages stay, so erratas are still applicable"""
+    out = []
+    for package in packages:
+        if not package['name'].startswith('benchmark-'):
+            package = dict(package, release=str(int(package['release']) + update))
+        out.append(package)
+    return out
+
+
+def _hwaddr(system, interface):
+    """Return MAC address unique for interface of given system"""
+    value = (system << 16) + interface
+    return '52:54:%02x:%02x:%02x:%02x' % tuple(
+        (value >> shift) & 0xff for shift in (24, 16, 8, 0))
+
+
+def _ipaddr(system, interface):
+    return '10.%s.%s.%s' % (interface % 256, (system >> 8) % 256, system % 256)
+
+
+def hardware_profile(devices=PROFILE['devices'],
+                     interfaces=PROFILE['interfaces'], system=0):
+    """Return hardware profile (as refresh_hw_profile takes it) with given
+       numbers of devices and network interfaces, addresses are unique for
+       every system number"""
+    out = []
+    for i in range(devices):
+        bus, driver, cls, desc = DEVICES[i % len(DEVICES)]
+        device = {'bus': bus, 'driver': driver, 'class': cls, 'desc': desc,
+                  'detached': '0', 'pciType': '1' if bus == 'pci' else '-1'}
+        if bus in ('pci', 'usb'):
+            device['prop1'] = '8086'
+            device['prop2'] = '%04X' % i
+        if cls == 'HD':
+            device['device'] = 'sd%s' % chr(ord('a') + i // len(DEVICES) % 26)
+        out.append(device)
+    out.append({'count': 4, 'model_ver': '37', 'speed': 2667, 'cache': '4096 KB',
+                'model_number': '6', 'bogomips': '5320.05', 'platform': 'x86_64',
+                'other': 'fpu vme de pse tsc msr pae mce cx8 apic sep mtrr',
+                'model_rev': '2',
+                'model': 'Intel(R) Core(TM) i7 CPU       M 620  @ 2.67GHz',
+                'type': 'GenuineIntel', 'class': 'CPU', 'desc': 'Processor'})
+    out.append({'ram': '3753', 'class': 'MEMORY', 'swap': '5823'})
+    out.append({'ip6addr': '::1', 'hostname': 'system-%s.example.com' % system,
+                'ipaddr': _ipaddr(system, 0), 'class': 'NETINFO'})
+    out.append({'product': '4313CTO', 'vendor': 'LENOVO', 'bios_vendor': 'LENOVO',
+                'system': '4313CTO ThinkPad T510', 'bios_release': '12/22/2009',
+                'board': 'LENOVO', 'bios_version': '6MET42WW (1.05 )',
+                'class': 'DMI', 'asset': '(system: R8348CE)'})
+    netinterfaces = {'class': 'NETINTERFACES',
+                     'lo': {'ipaddr': '127.0.0.1', 'module': 'loopback',
+                            'broadcast': '0.0.0.0', 'netmask': '255.0.0.0',
+                            'ipv6': [{'scope': 'host', 'netmask': 128, 'addr': '::1'}],
+                            'hwaddr': '00:00:00:00:00:00'}}
+    for i in range(interfaces):
+        ipaddr = _ipaddr(system, i)
+        netinterfaces['eth%s' % i] = {
+            'ipaddr': ipaddr, 'module': 'e1000e',
+            'broadcast': ipaddr.rsplit('.', 1)[0] + '.255',
+            'netmask': '255.255.255.0',
+            'ipv6': [{'scope': 'link', 'netmask': 64,
+                      'addr': 'fe80::%x:%x' % (system, i)}],
+            'hwaddr': _hwaddr(system, i)}
+    out.append(netinterfaces)
+    return out
+
+
+def payload_size(method, *args):
+    """Return size in bytes of XML-RPC request calling method with args"""
+    return len(xmlrpclib.dumps(args, method))
+
+
+def scaling_exponent(points):
+    """Return exponent b of latency = a * size ** b fitted (least squares
+       in log-log scale) to list of (size, latency) points: 1 means cost
+       grows linearly with size, more than 1 superlinearly. None when there
+       are less than two different sizes."""
+    points = [(math.log(s), math.log(l)) for s, l in points if s > 0 and l > 0]
+    if len(set([x for x, _ in points])) < 2:
+        return None
+    mean_x = sum([x for x, _ in points]) / len(points)
+    mean_y = sum([y for _, y in points]) / len(points)
+    return sum([(x - mean_x) * (y - mean_y) for x, y in points]) \
+        / sum([(x - mean_x) ** 2 for x, _ in points])
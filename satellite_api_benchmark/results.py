@@ -0,0 +1,204 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+"""Append-only JSONL files with measurements, one file per worker. Every
+   measurement is written and flushed as soon as it is made, so results of
+   crashed run are kept and nothing grows in memory during the run."""
+
+import os
+import json
+import glob
+import tempfile
+import logging
+
+from histogram import Histogram
+
+
+logger = logging.getLogger(__name__)
+
+# Markers about the whole run written by the process running the workers
+RUN_FILE = 'run.jsonl'
+
+
+class ResultsWriter(object):
+    """Writes measurements of one worker to its own file in results_dir"""
+
+    def __init__(self, results_dir):
+        if not os.path.isdir(results_dir):
+            try:
+                os.makedirs(results_dir)
+            except OSError:
+                pass   # other worker created it meanwhile
+        fd, self.path = tempfile.mkstemp(prefix='worker-', suffix='.jsonl',
+                                         dir=results_dir)
+        self.file = os.fdopen(fd, 'w')
+        logger.debug("Writing measurements to %s", self.path)
+
+    def write(self, action):
+        """Append one measurement"""
+        record = dict(action)
+        record['histogram'] = action['histogram'].to_dict()
+        self.file.write(json.dumps(record, default=str) + '\n')
+        self.file.flush()
+
+    def mark(self, **fields):
+        """Append record with information about the whole run rather than
+           a measurement, its 'type' is 'marker' unless given"""
+        fields.setdefault('type', 'marker')
+        self.file.write(json.dumps(fields) + '\n')
+        self.file.flush()
+
+    def close(self):
+        """Close the file, return its path"""
+        self.file.close()
+        return self.path
+
+
+def _steady_from(path):
+    """Return first steady state iteration marked in given file, if any"""
+    steady_from = None
+    with open(path) as f:
+        for line in f:
+            if '"marker"' not in line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get('type') == 'marker' and 'steady_from' in record:
+                steady_from = record['steady_from']
+    return steady_from
+
+
+def load_results(path, window=None):
+    """Yield measurements stored in given file one by one. When the file
+       marks where steady state begins, earlier iterations are skipped.
+       When window (start, end) is given, only measurements overlapping it
+       are yielded."""
+    steady_from = _steady_from(path)
+    with open(path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # Last line of crashed worker might be incomplete
+                logger.warning("Skipping malformed line in %s", path)
+                continue
+            if 'type' in record:
+                continue
+            if steady_from is not None and record.get('iteration', 0) < steady_from:
+                continue
+            if window is not None and (record['end'] <= window[0]
+                                       or record['start'] >= window[1]):
+                continue
+            record['histogram'] = Histogram.from_dict(record['histogram'])
+            yield record
+
+
+def mark_run(results_dir, **fields):
+    """Append marker about the whole run into RUN_FILE in results_dir"""
+    if not os.path.isdir(results_dir):
+        os.makedirs(results_dir)
+    fields.setdefault('type', 'marker')
+    with open(os.path.join(results_dir, RUN_FILE), 'a') as f:
+        f.write(json.dumps(fields) + '\n')
+
+
+def load_run(results_dir):
+    """Return dict with fields of all run markers in results_dir, later
+       markers override earlier ones"""
+    path = os.path.join(results_dir, RUN_FILE)
+    out = {}
+    if os.path.isfile(path):
+        with open(path) as f:
+            for line in f:
+                try:
+                    out.update(json.loads(line))
+                except ValueError:
+                    logger.warning("Skipping malformed line in %s", path)
+    return out
+
+
+def concurrent_window(results_dir):
+    """Return dict with start and end skew of workers with measurements in
+       results_dir and window (start, end) in which all of them were
+       measuring, which is None when they never all ran at once. Window
+       starts when the last worker recorded its first measurement (after its
+       warm-up), but not before workers were released to start at once
+       (when the run marked it), and ends when the first worker finished."""
+    spans = []
+    for path in results_files(results_dir):
+        starts, ends = [], []
+        for record in load_results(path):
+            starts.append(record['start'])
+            ends.append(record['end'])
+        if starts:
+            spans.append((min(starts), max(ends)))
+    if not spans:
+        return None
+    starts, ends = zip(*spans)
+    out = {'workers': len(spans),
+           'start': min(starts),
+           'end': max(ends),
+           'start_skew': max(starts) - min(starts),
+           'end_skew': max(ends) - min(ends),
+           'window': None}
+    start = max(max(starts), load_run(results_dir).get('released', 0))
+    if start < min(ends):
+        out['window'] = (start, min(ends))
+    return out
+
+
+def load_usage(path):
+    """Return list of resource usage records stored in given file"""
+    usages = []
+    with open(path) as f:
+        for line in f:
+            if '"usage"' not in line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get('type') == 'usage':
+                usages.append(record)
+    return usages
+
+
+class ResultsFollower(object):
+    """Returns lines and measurements appended to results files in
+       results_dir since previous call, while workers are writing them"""
+
+    def __init__(self, results_dir):
+        self.results_dir = results_dir
+        self.offsets = {}   # path: offset of first not returned line
+
+    def lines(self):
+        """Return list of (path, line) of new complete lines"""
+        out = []
+        for path in results_files(self.results_dir):
+            with open(path) as f:
+                f.seek(self.offsets.get(path, 0))
+                data = f.read()
+            # Last line might not be completely written yet
+            complete = data.rfind('\n') + 1
+            self.offsets[path] = self.offsets.get(path, 0) + complete
+            out += [(path, line) for line in data[:complete].splitlines()]
+        return out
+
+    def records(self):
+        """Return list of new measurements (not parsed into histograms)"""
+        out = []
+        for _, line in self.lines():
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if 'type' not in record:
+                out.append(record)
+        return out
+
+
+def results_files(results_dir):
+    """Return sorted list of worker files in results_dir"""
+    return sorted(glob.glob(os.path.join(results_dir, 'worker-*.jsonl')))
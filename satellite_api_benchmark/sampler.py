@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+"""Sampling of resource usage of Satellite server processes from /proc
+   during the benchmark. Processes are grouped by regular expressions
+   matched against their command line and every interval one sample per
+   group is written to results directory, with the same time stamps as
+   measurements have, so latency spikes can be matched to server component
+   which was busy at the time. Every process belongs to the first group
+   matching it."""
+
+import os
+import re
+import json
+import time
+import threading
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+SAMPLES_FILE = 'samples.jsonl'
+# Taskomatic is java with catalina/tomcat jars on its command line too, so
+# it has to come before tomcat
+PROCESS_GROUPS = [('taskomatic', r'taskomatic'),
+                  ('tomcat', r'tomcat|catalina'),
+                  ('httpd', r'^(/usr/sbin/)?httpd'),
+                  ('postgres', r'^postgres|postmaster')]
+CLOCK_TICKS = float(os.sysconf('SC_CLK_TCK'))
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+
+
+def _read(path):
+    """Return content of given file or None when process is gone or not
+       accessible"""
+    try:
+        with open(path) as f:
+            return f.read()
+    except IOError:
+        return None
+
+
+def process_stats(pid):
+    """Return CPU seconds, RSS bytes, threads, read and written bytes of
+       given process or None when it is gone"""
+    stat = _read('/proc/%s/stat' % pid)
+    if stat is None:
+        return None
+    # Process name in parenthesis can contain spaces
+    fields = stat[stat.rfind(')') + 2:].split()
+    out = {'cpu': (int(fields[11]) + int(fields[12])) / CLOCK_TICKS,
+           'rss': int(fields[21]) * PAGE_SIZE,
+           'threads': int(fields[17]),
+           'read_bytes': 0,
+           'write_bytes': 0}
+    io = _read('/proc/%s/io' % pid)   # readable by process owner only
+    for line in (io or '').splitlines():
+        key, _, value = line.partition(':')
+        if key in ('read_bytes', 'write_bytes'):
+            out[key] = int(value)
+    return out
+
+
+class ProcessSampler(threading.Thread):
+    """Thread writing resource usage of process groups (list of (name,
+       regular expression), the first matching group wins) every interval
+       seconds into SAMPLES_FILE in results_dir until stop() is called"""
+
+    def __init__(self, results_dir, groups=None, interval=1.0):
+        threading.Thread.__init__(self, name='ProcessSampler')
+        self.daemon = True
+        self.path = os.path.join(results_dir, SAMPLES_FILE)
+        self.groups = [(name, re.compile(pattern))
+                       for name, pattern in (groups or PROCESS_GROUPS)]
+        self.interval = interval
+        self._stop_event = threading.Event()
+        self._previous = {}   # pid: stats from previous sample
+
+    def stop(self):
+        """Stop sampling and wait for the thread to finish"""
+        self._stop_event.set()
+        self.join()
+
+    def processes(self):
+        """Return dict with group name of every matching process"""
+        out = {}
+        for pid in os.listdir('/proc'):
+            if not pid.isdigit():
+                continue
+            cmdline = _read('/proc/%s/cmdline' % pid)
+            if not cmdline:
+                continue   # kernel threads and processes which are gone
+            cmdline = cmdline.replace('\0', ' ').strip()
+            for name, pattern in self.groups:
+                if pattern.search(cmdline):
+                    out[int(pid)] = name
+                    break
+        return out
+
+    def sample(self, interval):
+        """Return list of per group samples, CPU and I/O are computed from
+           difference to the previous sample taken interval seconds ago"""
+        now = time.time()
+        current = {}
+        samples = dict((name, {'time': now, 'group': name, 'processes': 0,
+                               'cpu': 0.0, 'rss': 0, 'threads': 0,
+                               'read_bytes': 0, 'write_bytes': 0})
+                       for name, _ in self.groups)
+        for pid, name in self.processes().items():
+            stats = process_stats(pid)
+            if stats is None:
+                continue
+            current[pid] = stats
+            sample = samples[name]
+            sample['processes'] += 1
+            sample['rss'] += stats['rss']
+            sample['threads'] += stats['threads']
+            previous = self._previous.get(pid)
+            if previous is not None and interval:
+                sample['cpu'] += (stats['cpu'] - previous['cpu']) / interval
+                for k in ['read_bytes', 'write_bytes']:
+                    sample[k] += (stats[k] - previous[k]) / interval
+        self._previous = current
+        return [samples[name] for name in sorted(samples)]
+
+    def run(self):
+        logger.info("Sampling %s every %s s into %s",
+                    ', '.join(name for name, _ in self.groups), self.interval,
+                    self.path)
+        # CPU and I/O are differences to previous sample, so the first one
+        # only primes them and is not written
+        last = time.time()
+        self.sample(None)
+        with open(self.path, 'a') as f:
+            while True:
+                stopped = self._stop_event.wait(self.interval)
+                now = time.time()
+                # Last interval is cut short by stop()
+                for sample in self.sample(now - last):
+                    f.write(json.dumps(sample) + '\n')
+                f.flush()
+                last = now
+                if stopped:
+                    break
+
+
+def load_samples(results_dir):
+    """Return list of samples stored in results_dir, ordered by time"""
+    path = os.path.join(results_dir, SAMPLES_FILE)
+    if not os.path.isfile(path):
+        return []
+    samples = []
+    with open(path) as f:
+        for line in f:
+            try:
+                samples.append(json.loads(line))
+            except ValueError:
+                logger.warning("Skipping malformed line in %s", path)
+    return sorted(samples, key=lambda s: s['time'])
@@ -8,31 +8,141 @@ import sys
 import os
 import time
 import subprocess
+import multiprocessing
+import multiprocessing.pool
 import re
 import shutil
+import hashlib
+import tempfile
+import threading
+import Queue
+import socket
 import logging
 
 import xmlrpclib
-if sys.version_info >= (2, 7, 9):
-    import ssl
 
-import rpmfluff
+from histogram import Histogram
+from transport import make_transport, PHASES
+from results import ResultsWriter
+from workload import load_workload, execute_workload, sampler
+from usage import snapshot, usage_delta, pin_to_cpu
+from traces import TraceWriter
+from profiles import package_profile, updated_package_profile, \
+    hardware_profile, payload_size
 
 
 logger = logging.getLogger(__name__)
 
-def xmlrpc_login(server_url):
+MB = 1024.0 * 1024.0
+BUILD_CACHE = os.path.expanduser('~/.cache/satellite-api-benchmark/rpms')
+# Numbers of entities setup creates at scale 1, profile_packages is number
+# of packages in profile of every registered system
+DATASET = {'orgs': 100, 'users': 100, 'channels': 100, 'packages': 500,
+           'errata': 200, 'activationkeys': 100, 'systems': 1000,
+           'profile_packages': 1000}
+
+
+class DurationElapsed(Exception):
+    """Raised to stop the workload when time bounded run is over"""
+
+
+def xmlrpc_login(server_url, transport=None):
     """Generic login code"""
-    if sys.version_info >= (2, 7, 9):
-        # Workaround ssl.SSLError: [SSL: CERTIFICATE_VERIFY_FAILED]
-        # certificate verify failed (_ssl.c:590) when we do not care
-        # about security
-        # pylint: disable=W0212
-        context = ssl._create_unverified_context()
-        return xmlrpclib.Server(server_url, verbose=0,
-                                context=context)
-    else:
-        return xmlrpclib.Server(server_url, verbose=0)
+    if transport is None:
+        transport = make_transport(server_url)
+    return xmlrpclib.Server(server_url, transport=transport, verbose=0)
+
+
+def package_builds(count):
+    """Return list of (name, version, release, content, description) of
+       packages to build, two versions for every package"""
+    builds = []
+    for i in range(count):
+        name = 'benchmark-org-0-package-%s' % i
+        builds.append((name, '0.1', '1', "This is a test\n",
+                       'This rpm is a very simple one. Just food for a channel.'))
+        builds.append((name, '0.2', '1', "This is a new test\n",
+                       'This rpm is a very updated one.'))
+    return builds
+
+
+def dataset_sizes(scale=1.0, **sizes):
+    """Return DATASET counts multiplied by scale (except size of system
+       profile which does not grow with the dataset), overridden by
+       explicitly given counts"""
+    out = dict((k, max(int(round(v * scale)), 1)) for k, v in DATASET.items())
+    out['profile_packages'] = DATASET['profile_packages']
+    for entity, count in sizes.items():
+        assert entity in DATASET, "Unknown dataset entity %s" % entity
+        out[entity] = count
+    assert out['errata'] <= out['packages'], "Every errata needs its own package"
+    assert out['activationkeys'] <= out['channels'], \
+        "Every activation key needs its own channel"
+    return out
+
+
+def build_cache_key(build):
+    """Return cache key of package described by tuple from package_builds(),
+       it changes with name, version, release, file content or description"""
+    return hashlib.sha256(repr(tuple(build))).hexdigest()
+
+
+def build_package(build, cache_dir=None):
+    """Build package described by tuple from package_builds() in
+       test-rpmbuild-<name>-<version>-<release> directory and return
+       duration of the build and whether it was taken from cache. When
+       cache_dir is given, already built RPMs are copied from there instead
+       of invoking rpmbuild and newly built ones are stored there."""
+    # Needed only to build packages, so the rest (e.g. run against the
+    # mock server) works where rpm Python bindings are not available
+    import rpmfluff
+    name, version, release, content, description = build
+    start = time.time()
+    build_dir = 'test-rpmbuild-%s-%s-%s' % (name, version, release)
+    cache_entry = None
+    if cache_dir:
+        cache_entry = os.path.join(cache_dir, build_cache_key(build))
+        if os.path.isdir(cache_entry):
+            if os.path.isdir(build_dir):
+                shutil.rmtree(build_dir)
+            shutil.copytree(cache_entry, build_dir)
+            duration = time.time() - start
+            logger.debug("Reused cached %s-%s-%s in %.2f s", name, version, release, duration)
+            return duration, True
+    p = rpmfluff.SimpleRpmBuild(name, version, release)
+    p.add_installed_directory('/usr/share/%s' % name, mode=755)
+    p.add_installed_file('/usr/share/%s/something.txt' % name, rpmfluff.SourceFile('something.txt', content), mode='0644')
+    p.add_description(description)
+    p.make()
+    if cache_entry:
+        # Store only built RPMs, copy first and rename so concurrent
+        # builders never see partial cache entry
+        tmp = tempfile.mkdtemp(prefix='.tmp-', dir=cache_dir)
+        shutil.copytree(os.path.join(build_dir, 'RPMS'), os.path.join(tmp, 'RPMS'))
+        try:
+            os.rename(tmp, cache_entry)
+        except OSError:
+            shutil.rmtree(tmp)   # somebody else stored it meanwhile
+    duration = time.time() - start
+    logger.debug("Built %s-%s-%s in %.2f s", name, version, release, duration)
+    return duration, False
+
+
+def push_packages(args):
+    """Upload batch of packages with one rhnpush invocation. Takes tuple of
+       rhnpush command without packages and list of package paths, returns
+       number of packages, their size in bytes, duration of the upload and
+       rhnpush exit code."""
+    command, paths = args
+    size = sum([os.path.getsize(p) for p in paths])
+    start = time.time()
+    rc = subprocess.call(command + paths)
+    return len(paths), float(size), time.time() - start, rc
+
+
+def _build_package(args):
+    """Wrapper of build_package() usable with multiprocessing pool map"""
+    return build_package(*args)
 
 
 class Satellite5(object):
@@ -270,11 +380,63 @@ class Satellite5(object):
                   'ipv6': [{'scope': 'link', 'netmask': 64, 'addr': 'fe80::226:2dff:fef1:390a'}],
                   'hwaddr': '00:26:2d:f1:39:0a'}}]
 
-    def __init__(self, username, password, hostname):
+    def __init__(self, username, password, hostname, connection='keepalive',
+                 build_procs=None, build_cache=BUILD_CACHE, push_batch=50,
+                 push_procs=4, setup_procs=4, register_procs=4,
+                 multicall=0, rate_threads=32, replay_threads=None,
+                 scheme='https',
+                 results_dir=None, duration=None, warmup=0, steady_window=3,
+                 steady_cv=0.05, stop_on_steady=False, workload='default',
+                 sizes=None, pin_cpu=None, trace_dir=None,
+                 credentials=None, sample=None, seed=None):
         self.client = None
+        self.transport = None
+        self.connection = connection
+        self.build_procs = build_procs or multiprocessing.cpu_count()
+        self.build_cache = build_cache
+        self.push_batch = push_batch
+        self.push_procs = push_procs
+        self.setup_procs = setup_procs
+        self.register_procs = register_procs
+        self.multicall = multicall
+        self.rate_threads = rate_threads
+        self.replay_threads = replay_threads
+        self.scheme = scheme
+        self.duration = duration
+        self.warmup = warmup
+        self.steady_window = steady_window
+        self.steady_cv = steady_cv
+        self.stop_on_steady = stop_on_steady
+        self.workload = load_workload(workload)
+        self.sizes = sizes or dataset_sizes()
+        self.usage = None
+        self.trace = None
+        if trace_dir:
+            self.trace = TraceWriter(trace_dir)
+        self._sessions = 0
+        self.credentials = dict(credentials or {})
+        self.sample = None
+        if sample:
+            self.sample = sampler(sample, seed)
+        if pin_cpu is not None:
+            pin_to_cpu(pin_cpu)
+        self.steady_from = None
+        self.iteration = 0
+        self._iteration_stats = {}
+        self._warmup_end = None
+        self._deadline = None
+        self.results = None
+        if results_dir:
+            self.results = ResultsWriter(results_dir)
+        self._plan = None
+        self.server_url = None
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._phase_calls = None
         self.key = None
         self.username = username
         self.password = password
+        self.admin = (username, password)
         self.hostname = hostname
         self.actions = []
         self.created = []
@@ -292,29 +454,39 @@ class Satellite5(object):
         assert ent['used'] == 0, "Checking %s" % ent
         assert ent['allocated'] == 0, "Checking %s" % ent
         assert ent['free'] >= 0, "Checking %s" % ent
-        assert ent['unallocated'] >= 1000, "Checking %s" % ent
+        # First org gets entitlement for every system, others one each
+        needed = self.sizes['systems'] + self.sizes['orgs'] - 1
+        assert ent['unallocated'] >= needed, "Checking %s (need %s)" % (ent, needed)
         assert len(self.client.channel.listAllChannels(self.key)) == 0, "There should be no channels"
         assert len(self.client.org.listUsers(self.key, 1)) == 1
         assert len(self.client.system.listSystems(self.key)) == 0, "There should be no systems"
 
     def setup(self):
-        """Create all the required setup to run the workload"""
+        """Create all the required setup to run the workload, numbers of
+           entities are given by self.sizes"""
+        sizes = self.sizes
+        logger.info("Creating dataset %s", ', '.join(
+            '%s %s' % (k, v) for k, v in sorted(sizes.items())))
         logger.info("Building packages")
-        for i in range(500):
-            p = rpmfluff.SimpleRpmBuild('benchmark-org-0-package-%s' % i, '0.1', '1')
-            p.add_installed_directory('/usr/share/benchmark-org-0-package-%s' % i, mode=755)
-            p.add_installed_file('/usr/share/benchmark-org-0-package-%s/something.txt' % i, rpmfluff.SourceFile('something.txt', "This is a test\n"), mode='0644')
-            p.add_description('This rpm is a very simple one. Just food for a channel.')
-            p.make()
-            p = rpmfluff.SimpleRpmBuild('benchmark-org-0-package-%s' % i, '0.2', '1')
-            p.add_installed_directory('/usr/share/benchmark-org-0-package-%s' % i, mode=755)
-            p.add_installed_file('/usr/share/benchmark-org-0-package-%s/something.txt' % i, rpmfluff.SourceFile('something.txt', "This is a new test\n"), mode='0644')
-            p.add_description('This rpm is a very updated one.')
-            p.make()
-
-        logger.info("Creating orgs")
-        for i in range(100):
-            # Create org
+        builds = package_builds(sizes['packages'])
+        if self.build_cache and not os.path.isdir(self.build_cache):
+            os.makedirs(self.build_cache)
+        pool = multiprocessing.Pool(processes=self.build_procs)
+        start = time.time()
+        out = pool.map(_build_package, [(b, self.build_cache) for b in builds])
+        pool.close()
+        pool.join()
+        duration = time.time() - start
+        durations = [d for d, _ in out]
+        logger.info("Built %s packages (%s reused from cache %s) in %.2f s"
+                    " using %s processes, sum of build times %.2f s,"
+                    " speedup %.2fx",
+                    len(builds), len([c for _, c in out if c]),
+                    self.build_cache, duration, self.build_procs,
+                    sum(durations), sum(durations) / duration)
+
+        def create_org(i):
+            """Create org and give it entitlements"""
             params = [
                 'benchmark-org-%s' % i,   # orgName
                 'benchmark-org-%s-admin' % i,   # adminLogin
@@ -330,7 +502,7 @@ class Satellite5(object):
             # entitlements as we will use custom channel
             org_system_entitlements = 1
             if i == 0:
-                org_system_entitlements = 1000
+                org_system_entitlements = sizes['systems']
             # Add system entitlements
             s_entitlements = ['enterprise_entitled', 'provisioning_entitled']
             for se in s_entitlements:
@@ -349,8 +521,10 @@ class Satellite5(object):
                     1   # allocation
                 ]
                 self._api('org.setSoftwareEntitlements', *params)
-            # Store id of organization created
-            self.created.append(org['id'])
+            return org['id']
+
+        # Store ids of organizations created
+        self.created += self._phase("Creating orgs", create_org, range(sizes['orgs']))
 
         logger.info("As of now, we are going to work with first of created orgs only")
         self._logout()
@@ -358,8 +532,8 @@ class Satellite5(object):
         self.password = self.org_pass
         self._login()
 
-        logger.info("Creating users")
-        for i in range(100):
+        def create_user(i):
+            """Create user"""
             params = [
                 'benchmark-org-0-user-%s' % i,   # desiredLogin
                 'benchmark-org-0-pass-%s' % i,   # desiredPassword
@@ -370,8 +544,10 @@ class Satellite5(object):
             ]
             self._api('user.create', *params)
 
-        logger.info("Creating channels")
-        for i in range(100):
+        self._phase("Creating users", create_user, range(sizes['users']))
+
+        def create_channel(i):
+            """Create software channel"""
             params = [
                 'benchmark-org-0-channel-%s' % i,   # label
                 'benchmark-org-0-channel-%s' % i,   # name
@@ -383,26 +559,42 @@ class Satellite5(object):
             ]
             self._api('channel.software.create', *params)
 
-        logger.info("Pushing packages into first of created channel")
-        for i in range(500):
-            for v in ['0.1', '0.2']:
-                command = [
-                    'rhnpush',
-                    '--server',
-                    'http://%s/APP' % self.hostname,
-                    '-u',
-                    self.username,
-                    '-p',
-                    self.password,
-                    '-c',
-                    self.org_channel,
-                    '--nosig',
-                    'test-rpmbuild-benchmark-org-0-package-%s-%s-1/RPMS/x86_64/benchmark-org-0-package-%s-%s-1.x86_64.rpm' % (i, v, i, v),
-                ]
-                rc = subprocess.call(command)
-                assert rc == 0
+        self._phase("Creating channels", create_channel, range(sizes['channels']))
 
-        logger.info("Creating erratas")
+        logger.info("Pushing packages into first of created channel")
+        command = [
+            'rhnpush',
+            '--server',
+            'http://%s/APP' % self.hostname,
+            '-u',
+            self.username,
+            '-p',
+            self.password,
+            '-c',
+            self.org_channel,
+            '--nosig',
+        ]
+        paths = ['test-rpmbuild-%s-%s-%s/RPMS/x86_64/%s-%s-%s.x86_64.rpm' % (n, v, r, n, v, r)
+                 for n, v, r, _, _ in builds]
+        batches = [paths[i:i + self.push_batch]
+                   for i in range(0, len(paths), self.push_batch)]
+        pool = multiprocessing.pool.ThreadPool(processes=self.push_procs)
+        start = time.time()
+        out = pool.map(push_packages, [(command, b) for b in batches])
+        pool.close()
+        pool.join()
+        duration = time.time() - start
+        for i, (count, size, batch_duration, rc) in enumerate(out):
+            logger.info("Batch %s: pushed %s packages (%.2f MB) in %.2f s,"
+                        " %.2f packages/s, %.2f MB/s", i, count,
+                        size / MB, batch_duration, count / batch_duration,
+                        size / MB / batch_duration)
+            assert rc == 0, "rhnpush of batch %s failed with exit code %s" % (i, rc)
+        size = sum([b[1] for b in out])
+        logger.info("Pushed %s packages (%.2f MB) in %s batches using %s"
+                    " processes in %.2f s, %.2f packages/s, %.2f MB/s",
+                    len(paths), size / MB, len(batches), self.push_procs,
+                    duration, len(paths) / duration, size / MB / duration)
 
         def get_pid_by_name(n, e, v, r, a):
             """Return package ID for given package
@@ -416,7 +608,8 @@ class Satellite5(object):
             ]
             return self._api('packages.findByNvrea', *params)[0]['id']
 
-        for i in range(200):
+        def create_errata(i):
+            """Find package and create errata for it"""
             pid = get_pid_by_name('benchmark-org-0-package-%s' % i, '', '0.2', '1', 'x86_64')
             errata = {
                 'synopsis': 'Fake advisory in org 0 channel 0 for package %i' % i,
@@ -443,8 +636,10 @@ class Satellite5(object):
             ]
             self._api('errata.create', *params)
 
-        logger.info("Creating activation key")
-        for i in range(100):
+        self._phase("Creating erratas", create_errata, range(sizes['errata']))
+
+        def create_activationkey(i):
+            """Create activation key"""
             params = [
                 '',   # key
                 'Benchmark AK %s' % i,   # description
@@ -452,28 +647,47 @@ class Satellite5(object):
                 [],   # add-on entitlements
                 False,   # universalDefault
             ]
-            activationkey = self._api('activationkey.create', *params)
-            if i == 0:
-                ak = activationkey
-
-        logger.info("Registering hosts")
-        packages = []
-        for i in range(950):   # some random packages just to get some payload
-            packages.append({'name': 'package%s' % i,
-                             'version': '1.2',
-                             'release': '3',
-                             'epoch': '',
-                             'arch': 'x86_64'})
-        for i in range(50):   # packages to make erratas applicable
-            packages.append({'name': 'benchmark-org-0-package-%s' % i,
-                             'version': '0.1',
-                             'release': '1',
-                             'epoch': '',
-                             'arch': 'x86_64'})
-        server_url = "https://%s/XMLRPC" % self.hostname
-        client = xmlrpc_login(server_url)
-        for i in range(1000):
-            new_system = client.registration.new_system_user_pass(
+            return self._api('activationkey.create', *params)
+
+        ak = self._phase("Creating activation key", create_activationkey, range(sizes['activationkeys']))[0]
+
+        self.register(sizes['systems'], ak)
+
+        logger.info("Created organizations: %s" % self.created)
+        return self.created
+
+    def _registrant(self, ak=None):
+        """Log in as benchmark org admin, return activation key ak or the
+           first benchmark key when not given"""
+        if self.username != self.org_admin:
+            self._logout()
+            self.username = self.org_admin
+            self.password = self.org_pass
+            self._login()
+        if ak is None:
+            for key in self._api('activationkey.listActivationKeys'):
+                if key['description'] == 'Benchmark AK 0':
+                    ak = key['key']
+                    break
+            assert ak is not None, "Activation key 'Benchmark AK 0' not found"
+        return ak
+
+    def _package_profile(self, count):
+        """Return package profile where some packages make erratas
+           applicable and rest is random payload"""
+        return package_profile(count, min(self.sizes['errata'], count // 20))
+
+    def register(self, count, ak=None):
+        """Register count systems from self.register_procs concurrent
+           registrants with activation key ak (first benchmark key by
+           default) and upload their hardware profiles"""
+        ak = self._registrant(ak)
+        packages = self._package_profile(self.sizes['profile_packages'])
+
+        def register_system(i):
+            """Register system and upload its hardware profile"""
+            new_system = self._call(
+                'registration.new_system_user_pass',
                 'System %s' % i,
                 'RHEL Server',
                 '6Server',
@@ -481,13 +695,77 @@ class Satellite5(object):
                 self.username,
                 self.password,
                 {'packages': packages, 'token': ak})
-            client.registration.refresh_hw_profile(
+            self._call(
+                'registration.refresh_hw_profile',
                 new_system['system_id'],
                 self.hwinfo)
-        logger.info("Created organizations: %s" % self.created)
-        return self.created
 
-    def cleanup(self, orgs):
+        server_url = "%s://%s/XMLRPC" % (self.scheme, self.hostname)
+        self._phase("Registering hosts", register_system, range(count),
+                    server_url, self.register_procs)
+        return self.actions
+
+    def checkin(self, profiles, count):
+        """For every profile (dict with numbers of packages, devices and
+           interfaces) register count systems with its packages, then upload
+           their hardware profiles and updated package profiles, all from
+           self.register_procs concurrent clients. Return measurements
+           tagged with the profile and payload size of the call."""
+        ak = self._registrant()
+        server_url = "%s://%s/XMLRPC" % (self.scheme, self.hostname)
+        for n, profile in enumerate(profiles):
+            packages = self._package_profile(profile['packages'])
+            # Server has to replace the profile, not just compare it
+            updated = updated_package_profile(packages)
+            other = {'packages': packages, 'token': ak}
+
+            def register_system(i):
+                """Register system, return its system ID"""
+                return self._call(
+                    'registration.new_system_user_pass',
+                    'Profile %s system %s' % (n, i), 'RHEL Server',
+                    '6Server', 'x86_64', self.username, self.password,
+                    other)['system_id']
+
+            def refresh_hw_profile(item):
+                """Upload hardware profile unique for i-th system"""
+                i, system_id = item
+                self._call('registration.refresh_hw_profile', system_id,
+                           hardware_profile(profile['devices'],
+                                            profile['interfaces'], i))
+
+            def update_packages(system_id):
+                """Upload package profile of updated system"""
+                self._call('registration.update_packages', system_id, updated)
+
+            first = len(self.actions)
+            name = "%s packages, %s devices, %s interfaces" \
+                % (profile['packages'], profile['devices'], profile['interfaces'])
+            system_ids = self._phase("Registering systems with %s" % name,
+                                     register_system, range(count),
+                                     server_url, self.register_procs)
+            self._phase("Refreshing hardware profiles with %s" % name,
+                        refresh_hw_profile, list(enumerate(system_ids)), server_url,
+                        self.register_procs)
+            self._phase("Updating package profiles with %s" % name,
+                        update_packages, system_ids, server_url,
+                        self.register_procs)
+            sizes = {
+                'registration.new_system_user_pass': payload_size(
+                    'registration.new_system_user_pass',
+                    'Profile %s system 0' % n, 'RHEL Server', '6Server',
+                    'x86_64', self.username, self.password, other),
+                'registration.refresh_hw_profile': payload_size(
+                    'registration.refresh_hw_profile', system_ids[0],
+                    hardware_profile(profile['devices'], profile['interfaces'])),
+                'registration.update_packages': payload_size(
+                    'registration.update_packages', system_ids[0], updated)}
+            for action in self.actions[first:]:
+                action['profile'] = profile
+                action['payload_bytes'] = sizes[action['method']]
+        return self.actions
+
+    def cleanup(self, orgs, keep_cache=False):
         """Cleanup all the setup we did in setup()"""
         logger.info("Deleting organizations %s" % orgs)
         for i in orgs:
@@ -496,85 +774,560 @@ class Satellite5(object):
         for f in os.listdir('.'):
             if re.search('test-rpmbuild-.*', f):
                 shutil.rmtree(f)
+        if self.build_cache and not keep_cache and os.path.isdir(self.build_cache):
+            logger.info("Removing package build cache %s", self.build_cache)
+            shutil.rmtree(self.build_cache)
         logger.info("Cleanup finished")
 
     def run(self):
-        """Run the API benchmark"""
-        # This part runs with Satellite admin user
-        self.key = self._measure(self.repeats_default, 'auth.login', self.username, self.password)
-        orgs = self._measure(self.repeats_default, 'org.listOrgs')
-        orgid = None
-        for org in orgs:
-            odetail = self._measure(1, 'org.getDetails', org['name'])
-            if org['name'] == 'benchmark-org-0':
-                orgid = org['id']
+        """Run the API benchmark workload once or, when self.duration is
+           set, repeatedly for self.duration seconds after self.warmup
+           seconds of unrecorded warm-up. Resource usage of this process
+           during the run is recorded as well."""
+        before = snapshot()
+        try:
+            if self.duration:
+                self._run_duration()
+            else:
+                self._workload()
+        finally:
+            self.usage = usage_delta(before, snapshot())
+            if self.results is not None:
+                self.results.mark(type='usage', **self.usage)
+        return self._results()
+
+    def _run_duration(self):
+        """Repeat the workload until self.duration elapses, find out from
+           which iteration the results are in steady state"""
+        start = time.time()
+        self._warmup_end = start + self.warmup
+        self._deadline = self._warmup_end + self.duration
+        history = []   # (iteration, {method: throughput}) of full iterations
+        try:
+            while True:
+                if self.iteration > 0:
+                    # Previous iteration ended logged in as org admin
+                    self._logout()
+                    self.username, self.password = self.admin
+                    self._login()
+                self._iteration_stats = {}
+                iteration_start = time.time()
+                self._workload()
+                if iteration_start >= self._warmup_end:
+                    history.append((self.iteration, dict(
+                        (method, count / total)
+                        for method, (count, total) in self._iteration_stats.items()
+                        if total > 0)))
+                if self.steady_from is None and self._steady(history):
+                    self.steady_from = history[-self.steady_window][0]
+                    logger.info("Steady state reached in iteration %s",
+                                self.steady_from)
+                    if self.stop_on_steady:
+                        break
+                self.iteration += 1
+        except DurationElapsed:
+            logger.info("Run duration elapsed in iteration %s", self.iteration)
+        self._deadline = None
+        if self.steady_from is None:
+            logger.warning("Steady state not reached in %s iterations, "
+                           "reporting all of them", self.iteration + 1)
+        elif self.results is None:
+            self.actions = [a for a in self.actions
+                            if a.get('iteration', 0) >= self.steady_from]
+        else:
+            self.results.mark(steady_from=self.steady_from)
+
+    def _steady(self, history):
+        """Return True when throughput of every method varied less than
+           self.steady_cv (coefficient of variation) in the last
+           self.steady_window iterations"""
+        if len(history) < self.steady_window:
+            return False
+        window = [stats for _, stats in history[-self.steady_window:]]
+        for method in window[-1]:
+            values = [stats.get(method) for stats in window]
+            if None in values:
+                return False
+            mean = sum(values) / len(values)
+            variance = sum((v - mean) ** 2 for v in values) / len(values)
+            if variance ** 0.5 > self.steady_cv * mean:
+                return False
+        return True
+
+    def _workload(self):
+        """One pass of the API benchmark workload"""
+
+        def login(username, password):
+            """Switch session to given user"""
+            self._logout()
+            self.username = username
+            self.password = password
+            self._login()
+
+        def call(repeats, method, args):
+            """Measured repeated call, auth.login starts new session"""
+            output = self._measure(repeats, method, *args)
+            if method == 'auth.login':
+                self.key = output
+            return output
+
+        execute_workload(self.workload, self._variables(), login, call,
+                         self._measure_each, sample=self.sample)
+
+    def plan(self):
+        """Return list of (key, method, args) of calls run() would make, in
+           the same order. List calls needed to get arguments of detail calls
+           are made (unmeasured) to plan detail calls."""
+        calls = []
+        session = {'key': self.key}
+
+        def login(username, password):
+            """Log in (unmeasured) as given user"""
+            calls.append((None, 'auth.login', (username, password)))
+            session['key'] = self._api('auth.login', username, password)
+
+        def call(repeats, method, args):
+            """Plan repeated call, make it once to get its output"""
+            if method == 'auth.login':
+                calls.extend([(None, method, args)] * repeats)
+                session['key'] = self._api(method, *args)
+                return session['key']
+            calls.extend([(session['key'], method, args)] * repeats)
+            return getattr(self.client, method)(session['key'], *args)
+
+        def call_each(planned):
+            """Plan every call once, they are not made"""
+            calls.extend((session['key'], call[0], call[1:]) for call in planned)
+            return [None] * len(planned)
+
+        execute_workload(self.workload, self._variables(), login, call,
+                         call_each, sample=self.sample)
+        return calls
+
+    def _variables(self):
+        """Return variables available to workload steps"""
+        return {'username': self.admin[0],
+                'password': self.admin[1],
+                'org_admin': self.org_admin,
+                'org_pass': self.org_pass,
+                'org_channel': self.org_channel}
+
+    def run_rate(self, rate, duration):
+        """Send calls planned by plan() at constant rate (calls per second)
+           for duration seconds no matter how fast the server responds
+           (open-loop load). Calls are made from self.rate_threads threads
+           and their latency is measured from the time they were supposed
+           to be sent, so waiting for a free thread counts as well and
+           results do not suffer from coordinated omission. Achieved rate
+           is the rate of completed calls, growing backlog of calls waiting
+           for a thread (and delay of their start behind the schedule) shows
+           that the target rate was not sustained."""
+        if self._plan is None:
+            self._plan = self.plan()
+        calls = self._plan
+        queue = Queue.Queue()
+        measured = {}   # method: [histogram, errors, connections]
+        progress = {'completed': 0, 'last': None, 'lag': 0.0}
+
+        def worker():
+            """Make calls from queue until None comes"""
+            transport = make_transport(self.server_url, self.connection)
+            client = xmlrpc_login(self.server_url, transport)
+            while True:
+                item = queue.get()
+                if item is None:
+                    return
+                intended, (key, method, args) = item
+                if key is not None:
+                    args = (key,) + args
+                connections = transport.connections
+                started = time.time()
+                error = 0
+                try:
+                    getattr(client, method)(*args)
+                except (xmlrpclib.Error, socket.error), e:
+                    logger.warning("Call %s failed: %s", method, e)
+                    error = 1
+                completed = time.time()
+                latency = completed - intended
+                with self._lock:
+                    progress['completed'] += 1
+                    progress['last'] = completed
+                    progress['lag'] = max(progress['lag'], started - intended)
+                    if method not in measured:
+                        measured[method] = [Histogram(), 0, 0]
+                    measured[method][0].record(latency)
+                    measured[method][1] += error
+                    measured[method][2] += transport.connections - connections
+
+        threads = [threading.Thread(target=worker) for i in range(self.rate_threads)]
+        for thread in threads:
+            thread.start()
+        logger.info("Sending %s calls/s for %s s from %s threads", rate, duration, self.rate_threads)
+        start = time.time()
+        sent = 0
+        first_send = None
+        backlog = 0   # maximal number of calls waiting for a thread
+        while True:
+            intended = start + sent / float(rate)
+            if intended >= start + duration:
                 break
-        swe = self._measure(self.repeats_default, 'org.listSoftwareEntitlementsForOrg', orgid)
-        sye = self._measure(self.repeats_default, 'org.listSystemEntitlementsForOrg', orgid)
-        users = self._measure(self.repeats_default, 'org.listUsers', orgid)
-        # Below part runs with Org admin user
-        self._logout()
-        self.username = self.org_admin
-        self.password = self.org_pass
-        self._login()
-        # Users
-        users = self._measure(self.repeats_default, 'user.listUsers')
-        for user in users:
-            udetail = self._measure(1, 'user.getDetails', user['login'])
-        channels = self._measure(self.repeats_default, 'channel.listSoftwareChannels')
-        for channel in channels:
-            chdetail = self._measure(1, 'channel.software.getDetails', channel['label'])
-        # Packages
-        packages = self._measure(self.repeats_default, 'channel.software.listAllPackages', self.org_channel)
-        for package in packages:
-            pdetail = self._measure(1, 'packages.getDetails', package['id'])
-        # Errata
-        erratas = self._measure(self.repeats_default, 'channel.software.listErrata', self.org_channel)
-        for errata in erratas:
-            edetail = self._measure(1, 'errata.getDetails', errata['advisory_name'])
-        # Systems
-        systems = self._measure(self.repeats_default, 'system.listSystems')
-        for system in systems:
-            sdetail = self._measure(1, 'system.getDetails', system['id'])
-            sapplicable = self._measure(1, 'system.getUnscheduledErrata', system['id'])
+            delay = intended - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            queue.put((intended, calls[sent % len(calls)]))
+            if first_send is None:
+                first_send = time.time()
+            backlog = max(backlog, queue.qsize())
+            sent += 1
+        for thread in threads:
+            queue.put(None)
+        for thread in threads:
+            thread.join()
+        end = time.time()
+        # Calls are queued on schedule no matter how many of them wait, so
+        # only completions tell the rate the server sustained
+        achieved = None
+        if progress['completed'] and progress['last'] > first_send:
+            achieved = progress['completed'] / (progress['last'] - first_send)
+        logger.info("Target rate %s calls/s, achieved %s calls/s (%s calls), "
+                    "backlog up to %s calls, start up to %.3f s late",
+                    rate, achieved, sent, backlog, progress['lag'])
+        for method, (histogram, errors, connections) in sorted(measured.items()):
+            self._record({'repeats': histogram.count,
+                          'method': method,
+                          'args': (),
+                          'output_len': 0,
+                          'start': start,
+                          'end': end,
+                          'rate': rate,
+                          'achieved_rate': achieved,
+                          'max_backlog': backlog,
+                          'max_start_lag': progress['lag'],
+                          'errors': errors,
+                          'connections': connections,
+                          'histogram': histogram})
         return self.actions
 
+    def replay(self, trace, speed=1.0):
+        """Replay calls of trace (dict with list of calls of every session
+           as returned by load_trace()) speed times faster than they were
+           recorded. Every session is replayed from one thread and its own
+           connection, keeping order of its calls. There are replay_threads
+           threads (by default as many as workers recorded the trace), they
+           take sessions in order they started. Calls are sent at their
+           (scaled) time or as soon as previous call of the session finishes
+           and their latency is measured from the time they were sent;
+           maximal delay behind the schedule is recorded as lag."""
+        logins = set(c['args'][0] for calls in trace.values()
+                     for c in calls if c['method'] == 'auth.login')
+        for login in logins:
+            assert self._password(login) is not None, \
+                "Password of %s unknown, give it as credential" % login
+        sessions = sorted(trace.values(), key=lambda calls: calls[0]['time'])
+        first = sessions[0][0]['time']
+        # Session is named by process of worker and number of its login
+        threads = self.replay_threads or \
+            len(set(str(s).rsplit('-', 1)[0] for s in trace))
+        threads = min(threads, len(trace))
+        measured = {}   # method: [histogram, errors, connections, lag]
+        logger.info("Replaying %s calls of %s sessions at %sx speed"
+                    " from %s threads",
+                    sum([len(calls) for calls in trace.values()]),
+                    len(trace), speed, threads)
+        start = time.time()
+
+        def replay_session(calls):
+            """Make calls of one session in order"""
+            transport = make_transport(self.server_url, self.connection)
+            client = xmlrpc_login(self.server_url, transport)
+            key = None
+            for call in calls:
+                intended = start + (call['time'] - first) / speed
+                delay = intended - time.time()
+                if delay > 0:
+                    time.sleep(delay)
+                method = call['method']
+                if method == 'auth.login':
+                    args = (call['args'][0], self._password(call['args'][0]))
+                else:
+                    args = (key,) + tuple(call['args'])
+                connections = transport.connections
+                call_start = time.time()
+                error = 0
+                try:
+                    output = getattr(client, method)(*args)
+                    if method == 'auth.login':
+                        key = output
+                except (xmlrpclib.Error, socket.error), e:
+                    logger.warning("Call %s failed: %s", method, e)
+                    error = 1
+                latency = time.time() - call_start
+                with self._lock:
+                    if method not in measured:
+                        measured[method] = [Histogram(), 0, 0, 0.0]
+                    measured[method][0].record(latency)
+                    measured[method][1] += error
+                    measured[method][2] += transport.connections - connections
+                    measured[method][3] = max(measured[method][3],
+                                              call_start - intended)
+
+        pool = multiprocessing.pool.ThreadPool(processes=threads)
+        try:
+            # One session at a time, so threads take them in order
+            pool.map(replay_session, sessions, chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+        end = time.time()
+        for method, (histogram, errors, connections, lag) in sorted(measured.items()):
+            self._record({'repeats': histogram.count,
+                          'method': method,
+                          'args': (),
+                          'output_len': 0,
+                          'start': start,
+                          'end': end,
+                          'speed': speed,
+                          'errors': errors,
+                          'lag': lag,
+                          'connections': connections,
+                          'histogram': histogram})
+        return self.actions
+
+    def _password(self, login):
+        """Return password of given user for replaying its logins"""
+        if login == self.admin[0]:
+            return self.admin[1]
+        if login == self.org_admin:
+            return self.org_pass
+        return self.credentials.get(login)
+
+    def _record(self, action):
+        """Store one measurement, in results file when streaming results.
+           Measurements started during warm-up are dropped."""
+        if self._warmup_end is not None and action['start'] < self._warmup_end:
+            return
+        action['iteration'] = self.iteration
+        stats = self._iteration_stats.setdefault(action['method'], [0, 0.0])
+        stats[0] += action['histogram'].count
+        stats[1] += action['histogram'].total
+        if self.results is None:
+            self.actions.append(action)
+        else:
+            self.results.write(action)
+
+    def _results(self):
+        """Return list of measurements or path to file with them when
+           streaming results"""
+        if self.trace is not None:
+            self.trace.close()
+        if self.results is None:
+            return self.actions
+        return self.results.close()
+
+    def _trace(self, start, method, args, latency, size):
+        """Write call into trace when recording it, every login starts new
+           session"""
+        if self.trace is None:
+            return
+        if method == 'auth.login':
+            self._sessions += 1
+            args = (args[0], 'xxx')   # do not store passwords in traces
+        self.trace.write(start, '%s-%s' % (os.getpid(), self._sessions),
+                         method, args, latency, size)
+
     def _api(self, method, *args):
-        fce = getattr(self.client, method)
         if method == 'auth.login':
             logger.debug("Running unmeasured API login call %s", method)
-            return fce(*args)
         else:
             logger.debug("Running unmeasured API call %s %s", method, args)
-            return fce(self.key, *args)
+            args = (self.key,) + args
+        if self.trace is None or self._phase_calls is not None:
+            return self._call(method, *args)
+        start = time.time()
+        output = self._call(method, *args)
+        self._trace(start, method, args[1:] if method != 'auth.login' else args,
+                    time.time() - start, self.transport.last['response_bytes'])
+        return output
+
+    def _call(self, method, *args):
+        """Call given method with exactly given arguments, timing it when
+           running in setup phase"""
+        fce = getattr(self._client(), method)
+        if self._phase_calls is None:
+            return fce(*args)
+        # We are in setup phase, time the call as part of the phase
+        transport = self._local.transport
+        connections = transport.connections
+        start = time.time()
+        output = fce(*args)
+        duration = time.time() - start
+        with self._lock:
+            if method not in self._phase_calls:
+                self._phase_calls[method] = [Histogram(), 0]
+            self._phase_calls[method][0].record(duration)
+            self._phase_calls[method][1] += transport.connections - connections
+        return output
+
+    def _client(self):
+        """Return API client of current setup phase thread or the main one"""
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            return self.client
+        return client
+
+    def _phase(self, name, function, items, server_url=None, procs=None):
+        """Call function for every item from pool of procs (self.setup_procs
+           by default) threads, each having its own connection to
+           server_url (API by default). Return list of outputs in order of
+           items and record latency of every call made in this phase as
+           setup measurements."""
+        server_url = server_url or self.server_url
+        procs = procs or self.setup_procs
+        logger.info("%s (%s items, concurrency %s)", name, len(items), procs)
+
+        def thread_login():
+            """Give pool thread its own connection, session is shared"""
+            self._local.transport = make_transport(server_url, self.connection)
+            self._local.client = xmlrpc_login(server_url, self._local.transport)
+
+        self._phase_calls = {}
+        pool = multiprocessing.pool.ThreadPool(processes=procs,
+                                               initializer=thread_login)
+        start = time.time()
+        try:
+            out = pool.map(function, items)
+        finally:
+            pool.close()
+            pool.join()
+            end = time.time()
+            phase_calls, self._phase_calls = self._phase_calls, None
+        logger.info("%s took %.2f s, %.2f items/s", name, end - start,
+                    len(items) / (end - start))
+        for method, (histogram, connections) in sorted(phase_calls.items()):
+            self._record({'repeats': histogram.count,
+                          'method': method,
+                          'args': (),
+                          'output_len': 0,
+                          'start': start,
+                          'end': end,
+                          'connections': connections,
+                          'histogram': histogram})
+        return out
 
     def _measure(self, repeats, method, *args):
         """Run given API call, measure its duration and record
-           its measurement"""
+           its measurement. Failed call is recorded (with calls made before
+           it) as an error and its exception is raised again."""
         logger.debug("Running measured API call %s %s with %s repeats",
                      method, args if method != 'auth.login' else '(xxx)',
                      repeats)
+        self._check_deadline()
         fce = getattr(self.client, method)
+        histogram = Histogram()
+        phases = dict((k, 0) for k in PHASES + ['request_bytes', 'response_bytes'])
+        connections = self.transport.connections
         start = time.time()
+        failure = None
         for i in range(repeats):
-            if self.key and method != 'auth.login':
-                output = fce(self.key, *args)
-            else:
-                output = fce(*args)
+            call_start = time.time()
+            try:
+                if self.key and method != 'auth.login':
+                    output = fce(self.key, *args)
+                else:
+                    output = fce(*args)
+            except (xmlrpclib.Error, socket.error):
+                failure = sys.exc_info()
+                output = ()
+                histogram.record(time.time() - call_start)
+                break
+            histogram.record(time.time() - call_start)
+            for k, v in self.transport.last.items():
+                phases[k] += v
+            self._trace(call_start, method, args, time.time() - call_start,
+                        self.transport.last['response_bytes'])
+        end = time.time()
+        if method == 'auth.login':
+            args = (args[0], 'xxx')   # do not store passwords in results
+        self._record({'repeats': histogram.count,
+                      'method': method,
+                      'args': args,
+                      'output_len': len(output),
+                      'start': start,
+                      'end': end,
+                      'connections': self.transport.connections - connections,
+                      'phases': phases,
+                      'errors': 1 if failure else 0,
+                      'histogram': histogram})
+        if failure is not None:
+            raise failure[0], failure[1], failure[2]
+        return output
+
+    def _measure_each(self, calls):
+        """Run and measure every call given as (method, arg1, arg2...)
+           tuple once. When self.multicall is set, calls are sent in batches
+           of that size through system.multicall and per call duration is
+           derived from duration of the batch."""
+        if not self.multicall:
+            return [self._measure(1, call[0], *call[1:]) for call in calls]
+        outputs = []
+        for i in range(0, len(calls), self.multicall):
+            outputs += self._measure_batch(calls[i:i + self.multicall])
+        return outputs
+
+    def _measure_batch(self, calls):
+        """Run given calls in one system.multicall request and record
+           measurement for every method in the batch"""
+        logger.debug("Running measured API multicall with %s calls", len(calls))
+        self._check_deadline()
+        multicall = xmlrpclib.MultiCall(self.client)
+        for call in calls:
+            getattr(multicall, call[0])(self.key, *call[1:])
+        connections = self.transport.connections
+        start = time.time()
+        output = list(multicall())
         end = time.time()
-        self.actions.append({'repeats': repeats,
-                             'method': method,
-                             'args': args,
-                             'output_len': len(output),
-                             'start': start,
-                             'end': end})
+        last = self.transport.last
+        for call in calls:
+            self._trace(start, call[0], call[1:], (end - start) / len(calls),
+                        last['response_bytes'] / len(calls))
+        opened = self.transport.connections - connections
+        methods = []   # in order of first appearance in the batch
+        for call in calls:
+            if call[0] not in methods:
+                methods.append(call[0])
+        for method in methods:
+            histogram = Histogram()
+            args = [call[1:] for call in calls if call[0] == method]
+            for i in range(len(args)):
+                histogram.record((end - start) / len(calls))
+            # Phases of the batch are shared by its calls the same way
+            share = float(len(args)) / len(calls)
+            phases = dict((k, v * share) for k, v in last.items())
+            self._record({'repeats': len(args),
+                          'method': method,
+                          'args': args,
+                          'output_len': len(output),
+                          'start': start,
+                          'end': end,
+                          'batch': len(calls),
+                          'connections': opened,
+                          'phases': phases,
+                          'histogram': histogram})
+            opened = 0   # account connections to the first method only
         return output
 
+    def _check_deadline(self):
+        """Interrupt the workload when run duration elapsed"""
+        if self._deadline is not None and time.time() > self._deadline:
+            raise DurationElapsed()
+
     def _login(self):
         """Populate self.key"""
         logger.info("Logging in to %s as %s", self.hostname, self.username)
-        server_url = "https://%s/rpc/api" % self.hostname
-        self.client = xmlrpc_login(server_url)
+        self.server_url = "%s://%s/rpc/api" % (self.scheme, self.hostname)
+        self.transport = make_transport(self.server_url, self.connection)
+        self.client = xmlrpc_login(self.server_url, self.transport)
         logger.debug("Getting API key")
         self.key = self._api('auth.login', self.username, self.password)
 
@@ -0,0 +1,218 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+"""Rolling per interval aggregation of measurements while the benchmark
+   runs. Worker results files are followed as they grow, measurements are
+   put into intervals by the time they ended and every finished interval
+   is reported as calls per second, errors and latency percentiles per
+   method: on console, into CSV file and in Prometheus text exposition
+   format into file or on local HTTP endpoint. Measurements arriving after
+   their interval was reported count only into totals."""
+
+import os
+import sys
+import csv
+import time
+import threading
+import logging
+import BaseHTTPServer
+
+from histogram import Histogram
+from results import ResultsFollower
+
+
+logger = logging.getLogger(__name__)
+
+QUANTILES = [0.5, 0.9, 0.99]
+CSV_HEADER = ['time', 'method', 'calls', 'calls_per_s', 'errors', 'avg'] \
+    + ['p%s' % int(q * 100) for q in QUANTILES] + ['max']
+
+
+class _MetricsHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """Serves latest Prometheus text of the aggregator"""
+
+    aggregator = None
+
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = self.aggregator.prometheus()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug("Metrics request: " + format, *args)
+
+
+class RollingAggregator(threading.Thread):
+    """Thread following results files in results_dir and reporting every
+       interval seconds until stop() is called"""
+
+    def __init__(self, results_dir, interval=1.0, console=False,
+                 csv_path=None, prometheus_path=None, prometheus_port=None):
+        threading.Thread.__init__(self, name='RollingAggregator')
+        self.daemon = True
+        self.interval = interval
+        self.console = console
+        self.prometheus_path = prometheus_path
+        self._follower = ResultsFollower(results_dir)
+        self._stop_event = threading.Event()
+        self._lock = threading.Lock()
+        self._buckets = {}   # interval start: {method: [histogram, errors]}
+        self._totals = {}   # method: [calls, errors, duration]
+        self._last = (None, {})   # last reported interval
+        self._late = 0   # measurements of already reported intervals
+        self._csv_file = None
+        self._csv = None
+        if csv_path:
+            self._csv_file = open(csv_path, 'w')
+            self._csv = csv.writer(self._csv_file)
+            self._csv.writerow(CSV_HEADER)
+        self._server = None
+        if prometheus_port:
+            _MetricsHandler.aggregator = self
+            self._server = BaseHTTPServer.HTTPServer(('', prometheus_port),
+                                                     _MetricsHandler)
+            server = threading.Thread(target=self._server.serve_forever,
+                                      name='MetricsServer')
+            server.daemon = True
+            server.start()
+            logger.info("Serving metrics on http://localhost:%s/metrics",
+                        prometheus_port)
+
+    def stop(self):
+        """Report all remaining intervals and stop"""
+        self._stop_event.set()
+        self.join()
+        if self._server is not None:
+            self._server.shutdown()
+        if self._csv_file is not None:
+            self._csv_file.close()
+        if self.console:
+            sys.stderr.write('\n')
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            self._collect()
+            # Give workers one interval to write measurements ending in it
+            self._report(time.time() - self.interval)
+        self._collect()
+        self._report(None)
+        if self.prometheus_path:
+            # Totals may have grown by late measurements since last write
+            self._write_prometheus()
+        if self._late:
+            logger.info("%s measurements came after their interval was"
+                        " reported, they are counted in totals only",
+                        self._late)
+
+    def _add_totals(self, method, histogram, errors):
+        with self._lock:
+            totals = self._totals.setdefault(method, [0, 0, 0.0])
+            totals[0] += histogram.count
+            totals[1] += errors
+            totals[2] += histogram.total
+
+    def _collect(self):
+        for record in self._follower.records():
+            start = record['end'] - record['end'] % self.interval
+            if self._last[0] is not None and start <= self._last[0]:
+                # Reporting the interval again would duplicate it
+                self._late += 1
+                self._add_totals(record['method'],
+                                 Histogram.from_dict(record['histogram']),
+                                 record.get('errors', 0))
+                continue
+            bucket = self._buckets.setdefault(start, {})
+            if record['method'] not in bucket:
+                bucket[record['method']] = [Histogram(), 0]
+            bucket[record['method']][0].merge(
+                Histogram.from_dict(record['histogram']))
+            bucket[record['method']][1] += record.get('errors', 0)
+
+    def _report(self, before):
+        """Report intervals which ended before given time (all if None)"""
+        for start in sorted(self._buckets):
+            if before is not None and start + self.interval > before:
+                break
+            methods = self._buckets.pop(start)
+            for method, (histogram, errors) in methods.items():
+                self._add_totals(method, histogram, errors)
+            with self._lock:
+                self._last = (start, methods)
+            if self._csv is not None:
+                self._write_csv(start, methods)
+            if self.prometheus_path:
+                self._write_prometheus()
+            if self.console:
+                self._print(start, methods)
+
+    def _write_csv(self, start, methods):
+        for method, (histogram, errors) in sorted(methods.items()):
+            self._csv.writerow(
+                [start, method, histogram.count,
+                 histogram.count / self.interval, errors, histogram.mean()]
+                + [histogram.percentile(q * 100) for q in QUANTILES]
+                + [histogram.max])
+        self._csv_file.flush()
+
+    def _write_prometheus(self):
+        # Write whole file at once so scrapers never read half of it
+        tmp = self.prometheus_path + '.tmp'
+        with open(tmp, 'w') as f:
+            f.write(self.prometheus())
+        os.rename(tmp, self.prometheus_path)
+
+    def _print(self, start, methods):
+        histogram = Histogram()
+        for h, _ in methods.values():
+            histogram.merge(h)
+        errors = sum([e for _, e in methods.values()])
+        sys.stderr.write('\r%s %8.1f calls/s %4d errors  p50 %.4f  p99 %.4f  max %.4f '
+                         % (time.strftime('%H:%M:%S', time.localtime(start)),
+                            histogram.count / self.interval, errors,
+                            histogram.percentile(50), histogram.percentile(99),
+                            histogram.max))
+        sys.stderr.flush()
+
+    def prometheus(self):
+        """Return metrics in Prometheus text exposition format: totals
+           since start, rate of the last interval and latency summary with
+           quantiles of the last interval and sum and count since start"""
+        with self._lock:
+            start, methods = self._last
+            totals = dict(self._totals)
+        lines = []
+
+        def metric(name, kind, help, values):
+            lines.append('# HELP %s %s' % (name, help))
+            lines.append('# TYPE %s %s' % (name, kind))
+            for labels, value in values:
+                labels = ','.join('%s="%s"' % l for l in labels)
+                lines.append('%s{%s} %s' % (name, labels, repr(float(value))))
+
+        metric('satellite_api_errors_total', 'counter',
+               'Failed API calls',
+               [((('method', m),), t[1]) for m, t in sorted(totals.items())])
+        metric('satellite_api_calls_per_second', 'gauge',
+               'API calls per second in the last interval',
+               [((('method', m),), h.count / self.interval)
+                for m, (h, _) in sorted(methods.items())])
+        metric('satellite_api_latency_seconds', 'summary',
+               'API call latency, quantiles are of the last interval',
+               [((('method', m), ('quantile', str(q))), h.percentile(q * 100))
+                for m, (h, _) in sorted(methods.items()) for q in QUANTILES])
+        for m, t in sorted(totals.items()):
+            lines.append('satellite_api_latency_seconds_sum{method="%s"} %s'
+                         % (m, repr(float(t[2]))))
+            lines.append('satellite_api_latency_seconds_count{method="%s"} %s'
+                         % (m, repr(float(t[0]))))
+        if start is not None:
+            lines.append('# HELP satellite_api_interval_start_seconds Start of the last interval')
+            lines.append('# TYPE satellite_api_interval_start_seconds gauge')
+            lines.append('satellite_api_interval_start_seconds %s' % repr(start))
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+"""Traces of API calls for later replay. Every worker writes its own JSONL
+   file with one line per call: time, session (calls between two logins of
+   one worker), method, arguments without session key, latency and
+   response size. Passwords are not stored."""
+
+import os
+import json
+import glob
+import tempfile
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+
+class TraceWriter(object):
+    """Writes calls made by one worker to its own file in trace_dir"""
+
+    def __init__(self, trace_dir):
+        if not os.path.isdir(trace_dir):
+            try:
+                os.makedirs(trace_dir)
+            except OSError:
+                pass   # other worker created it meanwhile
+        fd, self.path = tempfile.mkstemp(prefix='trace-', suffix='.jsonl',
+                                         dir=trace_dir)
+        self.file = os.fdopen(fd, 'w')
+        logger.debug("Writing trace to %s", self.path)
+
+    def write(self, start, session, method, args, latency, size):
+        """Append one call"""
+        self.file.write(json.dumps({'time': start,
+                                    'session': session,
+                                    'method': method,
+                                    'args': args,
+                                    'latency': latency,
+                                    'size': size}, default=str) + '\n')
+        self.file.flush()
+
+    def close(self):
+        """Close the file, return its path"""
+        self.file.close()
+        return self.path
+
+
+def trace_files(trace_dir):
+    """Return sorted list of trace files in trace_dir"""
+    return sorted(glob.glob(os.path.join(trace_dir, 'trace-*.jsonl')))
+
+
+def load_trace(trace_dir):
+    """Return dict with list of calls of every session in trace_dir, in
+       order they were made"""
+    sessions = {}
+    for path in trace_files(trace_dir):
+        with open(path) as f:
+            for line in f:
+                try:
+                    call = json.loads(line)
+                except ValueError:
+                    logger.warning("Skipping malformed line in %s", path)
+                    continue
+                sessions.setdefault(call['session'], []).append(call)
+    for calls in sessions.values():
+        calls.sort(key=lambda c: c['time'])
+    return sessions
@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+"""XML-RPC transports which either keep one persistent HTTP/1.1
+   connection or open fresh connection for every call, count how many
+   connections they have opened and time phases of every call."""
+
+import sys
+import time
+import urllib
+
+import xmlrpclib
+if sys.version_info >= (2, 7, 9):
+    import ssl
+
+
+CONNECTION_MODES = ['keepalive', 'fresh']
+# Phases of the call: opening the connection, sending the request, waiting
+# for response (time to first byte), reading response body and parsing it
+PHASES = ['connect', 'write', 'ttfb', 'read', 'unmarshal']
+
+
+class _ConnectionCounter:
+    """Mixin counting connections opened by the transport. With `keepalive`
+       one connection is reused for all calls (httplib reconnects it
+       transparently when server closes it, which is counted as well),
+       otherwise connection is closed after every call. Durations of PHASES
+       and request and response body sizes of the last call are kept in
+       self.last."""
+
+    base = None
+    keepalive = True
+    last = None
+    _started = None
+    _sent = None
+
+    def make_connection(self, host):
+        connection = self.base.make_connection(self, host)
+        if not getattr(connection, 'counted', False):
+            connect = connection.connect
+
+            def counting_connect():
+                self.connections += 1
+                start = time.time()
+                try:
+                    return connect()
+                finally:
+                    self.last['connect'] += time.time() - start
+
+            connection.connect = counting_connect
+            connection.counted = True
+        return connection
+
+    def single_request(self, host, handler, request_body, verbose=0):
+        self.last = dict((phase, 0.0) for phase in PHASES)
+        self.last['request_bytes'] = len(request_body)
+        self.last['response_bytes'] = 0
+        self._started = self._sent = time.time()
+        try:
+            return self.base.single_request(self, host, handler,
+                                            request_body, verbose)
+        finally:
+            if not self.keepalive:
+                self.close()
+
+    def send_content(self, connection, request_body):
+        self.base.send_content(self, connection, request_body)
+        # Connection is opened lazily when sending the request
+        self._sent = time.time()
+        self.last['write'] = self._sent - self._started - self.last['connect']
+
+    def parse_response(self, response):
+        """Read whole response and only then parse it, so reading and
+           unmarshalling are timed separately"""
+        start = time.time()
+        self.last['ttfb'] = start - self._sent
+        stream = response
+        if response.getheader("Content-Encoding", "") == "gzip":
+            stream = xmlrpclib.GzipDecodedResponse(response)
+        body = stream.read()
+        read = time.time()
+        self.last['read'] = read - start
+        self.last['response_bytes'] = len(body)
+        parser, unmarshaller = self.getparser()
+        parser.feed(body)
+        parser.close()
+        output = unmarshaller.close()
+        self.last['unmarshal'] = time.time() - read
+        return output
+
+
+class CountingTransport(_ConnectionCounter, xmlrpclib.Transport):
+    """Plain HTTP transport counting its connections"""
+
+    base = xmlrpclib.Transport
+
+    def __init__(self, keepalive=True):
+        xmlrpclib.Transport.__init__(self)
+        self.keepalive = keepalive
+        self.connections = 0
+
+
+class CountingSafeTransport(_ConnectionCounter, xmlrpclib.SafeTransport):
+    """HTTPS transport counting its connections"""
+
+    base = xmlrpclib.SafeTransport
+
+    def __init__(self, keepalive=True):
+        if sys.version_info >= (2, 7, 9):
+            # Workaround ssl.SSLError: [SSL: CERTIFICATE_VERIFY_FAILED]
+            # certificate verify failed (_ssl.c:590) when we do not care
+            # about security
+            # pylint: disable=W0212
+            context = ssl._create_unverified_context()
+            xmlrpclib.SafeTransport.__init__(self, context=context)
+        else:
+            xmlrpclib.SafeTransport.__init__(self)
+        self.keepalive = keepalive
+        self.connections = 0
+
+
+def make_transport(server_url, mode='keepalive'):
+    """Return transport suitable for given URL in given connection mode"""
+    assert mode in CONNECTION_MODES, "Unknown connection mode %s" % mode
+    scheme, _ = urllib.splittype(server_url)
+    if scheme == 'https':
+        return CountingSafeTransport(keepalive=mode == 'keepalive')
+    return CountingTransport(keepalive=mode == 'keepalive')
@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+"""Resource usage of benchmark workers (CPU time, memory, context
+   switches), so it is visible when the load generator itself is the
+   bottleneck, e.g. when it shares CPUs with Satellite on localhost."""
+
+import os
+import time
+import resource
+import subprocess
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+
+def _proc_status(pid='self'):
+    """Return dict with numeric fields of /proc/<pid>/status (Linux only)"""
+    out = {}
+    try:
+        with open('/proc/%s/status' % pid) as f:
+            for line in f:
+                key, _, value = line.partition(':')
+                value = value.split()
+                if value and value[0].isdigit():
+                    out[key] = int(value[0])
+    except IOError:
+        pass
+    return out
+
+
+def snapshot():
+    """Return current resource usage of this process"""
+    rusage = resource.getrusage(resource.RUSAGE_SELF)
+    status = _proc_status()
+    return {'time': time.time(),
+            'user': rusage.ru_utime,
+            'sys': rusage.ru_stime,
+            'maxrss': status.get('VmHWM', rusage.ru_maxrss),   # kB
+            'rss': status.get('VmRSS'),   # kB
+            'voluntary': rusage.ru_nvcsw,
+            'involuntary': rusage.ru_nivcsw}
+
+
+def usage_delta(before, after):
+    """Return resource usage between two snapshots, with 'cpu' being share
+       of one CPU used in that time"""
+    wall = after['time'] - before['time']
+    out = {'pid': os.getpid(),
+           'start': before['time'],
+           'end': after['time'],
+           'maxrss': after['maxrss'],
+           'rss': after['rss']}
+    for k in ['user', 'sys', 'voluntary', 'involuntary']:
+        out[k] = after[k] - before[k]
+    out['cpu'] = (out['user'] + out['sys']) / wall if wall > 0 else 0.0
+    return out
+
+
+def pin_to_cpu(cpu):
+    """Restrict this process to given CPU (list) using taskset, as Python 2
+       has no os.sched_setaffinity"""
+    with open(os.devnull, 'w') as devnull:
+        try:
+            rc = subprocess.call(['taskset', '-pc', str(cpu), str(os.getpid())],
+                                 stdout=devnull)
+        except OSError, e:
+            logger.warning("Can not pin to CPU %s, taskset failed: %s", cpu, e)
+            return False
+    if rc != 0:
+        logger.warning("Can not pin to CPU %s, taskset exited with %s", cpu, rc)
+        return False
+    logger.debug("Pinned process %s to CPU %s", os.getpid(), cpu)
+    return True
@@ -0,0 +1,225 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+"""Declarative workloads: which API calls run makes, how many times and
+   with which arguments, loaded from JSON (or YAML when PyYAML is installed)
+   file. Workload is a dict with list of steps, every step is one of:
+
+   {"method": M, "args": [...], "repeats": N, "save": VAR}
+       call M N times (workload "repeats" by default), store output in VAR;
+       output of auth.login becomes session key for following calls
+   {"foreach": VAR, "calls": [{"method": M, "args": [...]}, ...],
+    "until": {FIELD: VALUE}}
+       call every method once for every item of list VAR (up to and
+       including first item matching "until"), "method" and "args" can be
+       given directly instead of "calls"; when sampling, only sample of
+       items is used unless the step has "until" or "sample": false
+   {"find": VAR, "in": LIST, "where": {FIELD: VALUE}}
+       store first item of LIST matching "where" in VAR
+   {"login": [USER, PASSWORD]}
+       log out and log in as given user (not measured)
+   {"mix": [{"weight": W, "method": M, "args": [...], "foreach": VAR}, ...],
+    "calls": N}
+       make N calls, each picked randomly with probability proportional to
+       its weight, "$item" in arguments is random item of list VAR
+
+   String argument "$name.field" is replaced by value of variable (or
+   "$item" of the loop) and its field."""
+
+import os
+import math
+import json
+import random
+import bisect
+import logging
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+
+logger = logging.getLogger(__name__)
+
+WORKLOADS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             'workloads')
+STEP_KINDS = ['method', 'foreach', 'find', 'login', 'mix']
+
+
+def workload_path(name):
+    """Return path to workload file given by path or name of workload
+       shipped in WORKLOADS_DIR"""
+    if os.path.isfile(name):
+        return name
+    for extension in ['.json', '.yaml', '.yml']:
+        path = os.path.join(WORKLOADS_DIR, name + extension)
+        if os.path.isfile(path):
+            return path
+    raise IOError("Workload %s not found (shipped workloads: %s)"
+                  % (name, ', '.join(shipped_workloads())))
+
+
+def shipped_workloads():
+    """Return names of workloads shipped in WORKLOADS_DIR"""
+    return sorted(os.path.splitext(f)[0] for f in os.listdir(WORKLOADS_DIR))
+
+
+def load_workload(name):
+    """Load and check workload given by path or name"""
+    path = workload_path(name)
+    with open(path) as f:
+        if path.endswith('.json'):
+            workload = json.load(f)
+        else:
+            assert yaml is not None, "PyYAML is needed to load %s" % path
+            workload = yaml.safe_load(f)
+    check_workload(workload)
+    logger.debug("Loaded workload %s from %s", workload.get('name'), path)
+    return workload
+
+
+def step_kind(step):
+    """Return kind of given step ("method" can be part of foreach step)"""
+    kinds = [kind for kind in STEP_KINDS[1:] if kind in step]
+    if not kinds and STEP_KINDS[0] in step:
+        kinds = STEP_KINDS[:1]
+    assert len(kinds) == 1, "Step %s has to have exactly one of %s" \
+        % (step, ', '.join(STEP_KINDS))
+    return kinds[0]
+
+
+def step_calls(step):
+    """Return list of {"method", "args"} dicts made for every item of
+       foreach step"""
+    if 'calls' in step:
+        return step['calls']
+    return [{'method': step['method'], 'args': step.get('args', [])}]
+
+
+def check_workload(workload):
+    """Fail with AssertionError when workload is malformed"""
+    assert isinstance(workload.get('steps'), list) and workload['steps'], \
+        "Workload has to have non-empty list of steps"
+    for step in workload['steps']:
+        kind = step_kind(step)
+        if kind == 'foreach':
+            for call in step_calls(step):
+                assert 'method' in call, "Call %s has no method" % call
+        elif kind == 'find':
+            assert 'in' in step and 'where' in step, \
+                "Step %s needs 'in' and 'where'" % step
+        elif kind == 'login':
+            assert len(step['login']) == 2, \
+                "Step %s needs [user, password]" % step
+        elif kind == 'mix':
+            assert step['mix'] and all('method' in e and e.get('weight', 1) > 0
+                                       for e in step['mix']), \
+                "Mix %s needs entries with method and positive weight" % step
+            assert 'calls' in step, "Mix %s needs number of calls" % step
+
+
+def resolve(value, variables, item=None):
+    """Return value with "$variable.field" strings replaced"""
+    if isinstance(value, list):
+        return [resolve(v, variables, item) for v in value]
+    if not isinstance(value, basestring) or not value.startswith('$'):
+        return value
+    path = value[1:].split('.')
+    if path[0] == 'item':
+        out = item
+    else:
+        assert path[0] in variables, "Unknown variable %s" % path[0]
+        out = variables[path[0]]
+    for field in path[1:]:
+        out = out[field]
+    return out
+
+
+def matches(item, where):
+    """Return True when item has all fields from where with given values"""
+    return all(item.get(k) == v for k, v in where.items())
+
+
+def foreach_items(step, variables):
+    """Return items of foreach step, up to its "until" item"""
+    items = []
+    for item in resolve('$' + step['foreach'], variables):
+        items.append(item)
+        if 'until' in step and matches(item, step['until']):
+            break
+    return items
+
+
+def mix_calls(step, variables, rng):
+    """Return list of (method, arg1, arg2...) tuples drawn from mix step"""
+    entries = step['mix']
+    thresholds = []
+    total = 0.0
+    for entry in entries:
+        total += entry.get('weight', 1)
+        thresholds.append(total)
+    calls = []
+    for i in range(step['calls']):
+        entry = entries[bisect.bisect_right(thresholds, rng.random() * total)]
+        item = None
+        if 'foreach' in entry:
+            item = rng.choice(resolve('$' + entry['foreach'], variables))
+        calls.append((entry['method'],) +
+                     tuple(resolve(entry.get('args', []), variables, item)))
+    return calls
+
+
+def sampler(size, seed=None):
+    """Return function returning random sample of given size (number of
+       items or fraction when float below 1) of list, keeping order of
+       items. Samples are reproducible for given seed."""
+    rng = random.Random(seed)
+
+    def sample(items):
+        count = int(size)
+        if isinstance(size, float) and size < 1:
+            count = int(math.ceil(size * len(items)))
+        if count >= len(items):
+            return items
+        return [items[i] for i in sorted(rng.sample(range(len(items)), count))]
+    return sample
+
+
+def execute_workload(workload, variables, login, call, call_each, rng=None,
+                     sample=None):
+    """Walk through the workload steps. login(user, password) switches
+       session, call(repeats, method, args) makes repeated call and returns
+       its output, call_each(calls) makes every (method, arg1, arg2...)
+       call once and returns list of their outputs. sample(items) returns
+       items of foreach steps to use."""
+    variables = dict(variables)
+    rng = rng or random.Random(workload.get('seed'))
+    repeats = workload.get('repeats', 10)
+    for step in workload['steps']:
+        kind = step_kind(step)
+        output = None
+        if kind == 'method':
+            output = call(step.get('repeats', repeats), step['method'],
+                          tuple(resolve(step.get('args', []), variables)))
+        elif kind == 'foreach':
+            calls = []
+            items = foreach_items(step, variables)
+            if sample and 'until' not in step and step.get('sample', True):
+                items = sample(items)
+            for item in items:
+                for c in step_calls(step):
+                    calls.append((c['method'],) +
+                                 tuple(resolve(c.get('args', []), variables, item)))
+            output = call_each(calls)
+        elif kind == 'find':
+            found = [i for i in resolve('$' + step['in'], variables)
+                     if matches(i, step['where'])]
+            assert found, "Nothing in %s matches %s" % (step['in'], step['where'])
+            variables[step['find']] = found[0]
+        elif kind == 'login':
+            login(*resolve(step['login'], variables))
+        elif kind == 'mix':
+            output = call_each(mix_calls(step, variables, rng))
+        if 'save' in step:
+            variables[step['save']] = output
+    return variables
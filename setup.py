@@ -23,6 +23,7 @@ setup(name='satellite_api_benchmark',
       author_email='jhutar@redhat.com',
       license='GPLv3+',
       packages=['satellite_api_benchmark'],
+      package_data={'satellite_api_benchmark': ['workloads/*.json']},
       install_requires=['tabulate'],
       include_package_data=True,
       zip_safe=False)
@@ -0,0 +1,61 @@
+# -*- coding: UTF-8 -*-
+
+"""Fixtures shared by tests"""
+
+import os
+import imp
+import threading
+
+import pytest
+
+from satellite_api_benchmark.mockserver import MockSatellite, MockServer
+
+
+CLI = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                   'satellite-api-benchmark.py')
+
+
+def serve(**kwargs):
+    """Start small populated mock listening on ephemeral port, return the
+       server"""
+    satellite = MockSatellite(orgs=2, users=3, channels=3, packages=10,
+                              errata=5, activationkeys=2, systems=5, seed=0,
+                              **kwargs)
+    server = MockServer(('localhost', 0), satellite)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return server
+
+
+@pytest.fixture
+def mock():
+    """Mock responding immediately, given as host:port"""
+    server = serve()
+    yield 'localhost:%s' % server.server_address[1]
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def slow_mock():
+    """Mock taking 50 ms to serve every call, given as host:port"""
+    server = serve(service_time=0.05)
+    yield 'localhost:%s' % server.server_address[1]
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(scope='session')
+def cli():
+    """Command line script loaded as module"""
+    return imp.load_source('satellite_api_benchmark_cli', CLI)
+
+
+@pytest.fixture
+def empty_mock():
+    """Mock with no content, as check and setup want it"""
+    server = serve(populated=False)
+    yield 'localhost:%s' % server.server_address[1]
+    server.shutdown()
+    server.server_close()
@@ -0,0 +1,76 @@
+# -*- coding: UTF-8 -*-
+
+"""Mann-Whitney test and bootstrap of latency comparison"""
+
+import random
+
+import pytest
+
+from satellite_api_benchmark.histogram import Histogram
+from satellite_api_benchmark.compare import (mann_whitney, bootstrap_change,
+                                             compare, _binomial)
+
+
+def histogram(values):
+    out = Histogram()
+    for value in values:
+        out.record(value)
+    return out
+
+
+def test_mann_whitney_known_value():
+    # Microsecond values land in exact buckets, U = 25 out of 5 * 5 and
+    # scipy.stats.mannwhitneyu gives the same p-value
+    old = histogram([i * 1e-6 for i in range(1, 6)])
+    new = histogram([i * 1e-6 for i in range(6, 11)])
+    assert mann_whitney(old, new) == pytest.approx(0.0121858, abs=1e-6)
+    assert mann_whitney(new, old) == pytest.approx(0.0121858, abs=1e-6)
+
+
+def test_mann_whitney_ties():
+    # U = 7, tie corrected variance 9 / 12 * (7 - 60 / 30) = 3.75
+    old = histogram([i * 1e-6 for i in (1, 2, 2)])
+    new = histogram([i * 1e-6 for i in (2, 2, 3)])
+    assert mann_whitney(old, new) == pytest.approx(0.3016996, abs=1e-6)
+    same = histogram([1e-3] * 10)
+    assert mann_whitney(same, same) == 1.0
+
+
+def test_binomial_moments():
+    rng = random.Random(0)
+    for n, p in [(10, 0.3), (1000, 0.002), (1000, 0.999), (100000, 0.5)]:
+        draws = [_binomial(rng, n, p) for i in range(4000)]
+        mean = sum(draws) / float(len(draws))
+        variance = sum((d - mean) ** 2 for d in draws) / (len(draws) - 1)
+        assert all(0 <= d <= n for d in draws)
+        assert mean == pytest.approx(n * p, rel=0.05, abs=0.05)
+        assert variance == pytest.approx(n * p * (1 - p), rel=0.1, abs=0.05)
+    assert _binomial(rng, 10, 0) == 0 and _binomial(rng, 10, 1) == 10
+
+
+def test_bootstrap_change():
+    rng = random.Random(1)
+    base = [rng.uniform(0.01, 0.02) for i in range(2000)]
+    old = histogram(base)
+    low, high = bootstrap_change(old, histogram([v * 2 for v in base]))
+    assert low < 1.0 < high
+    assert high - low < 0.1
+    low, high = bootstrap_change(old, histogram(base))
+    assert low < 0 < high
+    assert bootstrap_change(old, old) == bootstrap_change(old, old)
+
+
+def test_compare_verdicts():
+    rng = random.Random(2)
+    base = [rng.uniform(0.01, 0.02) for i in range(500)]
+    old = {'a': histogram(base), 'b': histogram(base), 'c': histogram(base),
+           'only_old': histogram(base)}
+    new = {'a': histogram([v * 1.5 for v in base]),
+           'b': histogram([v / 1.5 for v in base]),
+           'c': histogram(base)}
+    rows = dict((r['method'], r) for r in compare(old, new))
+    assert sorted(rows) == ['a', 'b', 'c']
+    assert rows['a']['verdict'] == 'REGRESSION'
+    assert rows['a']['change'] == pytest.approx(0.5)
+    assert rows['b']['verdict'] == 'improvement'
+    assert rows['c']['verdict'] == '' and rows['c']['p'] == pytest.approx(1.0)
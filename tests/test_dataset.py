@@ -0,0 +1,49 @@
+# -*- coding: UTF-8 -*-
+
+"""Scaled dataset sizes"""
+
+import xmlrpclib
+
+import pytest
+
+from satellite_api_benchmark import Satellite5, DATASET, dataset_sizes
+
+
+def test_scaled_sizes():
+    sizes = dataset_sizes(0.1)
+    assert sizes['orgs'] == 10 and sizes['systems'] == 100
+    assert sizes['packages'] == 50 and sizes['errata'] == 20
+    # Profile of a system does not grow with the dataset
+    assert sizes['profile_packages'] == DATASET['profile_packages']
+    assert dataset_sizes(0.001)['orgs'] == 1   # never less than one
+    assert dataset_sizes(2, systems=5)['systems'] == 5
+    assert dataset_sizes(2, systems=5)['users'] == 200
+
+
+def test_inconsistent_sizes():
+    with pytest.raises(AssertionError):
+        dataset_sizes(errata=600)
+    with pytest.raises(AssertionError):
+        dataset_sizes(0.5, activationkeys=60)
+    with pytest.raises(AssertionError):
+        dataset_sizes(servers=1)
+
+
+def test_check_needs_entitlements_for_dataset(empty_mock):
+    Satellite5('admin', 'password', empty_mock, scheme='http',
+               sizes=dataset_sizes(10)).check()
+    with pytest.raises(AssertionError):
+        Satellite5('admin', 'password', empty_mock, scheme='http',
+                   sizes=dataset_sizes(systems=10 ** 6)).check()
+
+
+def test_register_systems(mock):
+    sab = Satellite5('admin', 'password', mock, scheme='http',
+                     sizes=dataset_sizes(0.01, profile_packages=30))
+    server = xmlrpclib.ServerProxy('http://%s/rpc/api' % mock)
+    key = server.auth.login(sab.org_admin, sab.org_pass)
+    before = len(server.system.listSystems(key))
+    sab.register(3)
+    assert len(server.system.listSystems(key)) == before + 3
+    assert [a['repeats'] for a in sab.actions
+            if a['method'] == 'registration.new_system_user_pass'] == [3]
@@ -0,0 +1,136 @@
+# -*- coding: UTF-8 -*-
+
+"""Coordinator running the benchmark on two local agents"""
+
+import os
+import time
+import socket
+import threading
+import multiprocessing
+
+import pytest
+
+from satellite_api_benchmark import (Satellite5, Histogram, coordinate,
+                                     serve_agent, results_files, load_results,
+                                     load_run, concurrent_window)
+from satellite_api_benchmark import distributed
+from satellite_api_benchmark.results import ResultsWriter
+
+
+def free_port():
+    s = socket.socket()
+    s.bind(('localhost', 0))
+    port = s.getsockname()[1]
+    s.close()
+    return port
+
+
+def start_agent(run_workers):
+    """Start agent in daemon thread, return its host:port"""
+    port = free_port()
+    thread = threading.Thread(target=serve_agent,
+                              args=(run_workers, port, 'localhost'))
+    thread.daemon = True
+    thread.start()
+    for i in range(50):
+        try:
+            socket.create_connection(('localhost', port)).close()
+            break
+        except socket.error:
+            threading.Event().wait(0.1)
+    return 'localhost:%s' % port
+
+
+def run_workers(procs, username, password, hostname, results_dir, pin_cpus,
+                ready_callback, **kwargs):
+    """Run one worker in agent's process"""
+    sab = Satellite5(username, password, hostname, results_dir=results_dir,
+                     **kwargs)
+    ready_callback()
+    sab.run()
+    return 0
+
+
+def test_two_agents(mock, tmpdir):
+    agents = [start_agent(run_workers), start_agent(run_workers)]
+    results_dir = str(tmpdir)
+    request = {'procs': 1, 'username': 'admin', 'password': 'password',
+               'hostname': mock, 'pin_cpus': None,
+               'kwargs': {'scheme': 'http'}}
+    wall, errors = coordinate(agents, results_dir, request)
+    assert errors == []
+    files = results_files(results_dir)
+    assert sorted(os.path.basename(f)[:13] for f in files) == \
+        ['worker-agent0', 'worker-agent1']
+    for f in files:
+        methods = set(r['method'] for r in load_results(f))
+        assert 'auth.login' in methods and 'system.getDetails' in methods
+    run = load_run(results_dir)
+    assert run['cpus'] == 2 * multiprocessing.cpu_count()
+    assert run['released'] > 0
+
+
+class SkewedClock(object):
+    """Clock of agent threads an hour ahead of the coordinator's"""
+
+    SKEW = 3600
+
+    def time(self):
+        if threading.current_thread().name == 'MainThread':
+            return time.time()
+        return time.time() + self.SKEW
+
+
+def test_agent_clock_skew(tmpdir, monkeypatch):
+    monkeypatch.setattr(distributed, 'time', SkewedClock())
+
+    def skewed_run_workers(procs, username, password, hostname, results_dir,
+                           pin_cpus, ready_callback, **kwargs):
+        writer = ResultsWriter(results_dir)
+        ready_callback()
+        now = time.time() + SkewedClock.SKEW
+        histogram = Histogram()
+        histogram.record(0.5)
+        writer.write({'method': 'api.getVersion', 'start': now - 0.5,
+                      'end': now, 'histogram': histogram})
+        writer.mark(steady_from=0)
+        writer.close()
+        return 0
+
+    results_dir = str(tmpdir)
+    request = {'procs': 1, 'username': 'admin', 'password': 'password',
+               'hostname': 'localhost', 'pin_cpus': None, 'kwargs': {}}
+    wall, errors = coordinate([start_agent(skewed_run_workers)],
+                              results_dir, request)
+    end = time.time()
+    assert errors == []
+    released = load_run(results_dir)['released']
+    records = [r for f in results_files(results_dir) for r in load_results(f)]
+    assert len(records) == 1
+    assert released <= records[0]['end'] <= end
+    assert records[0]['end'] - records[0]['start'] == pytest.approx(0.5)
+    window = concurrent_window(results_dir)
+    assert window['window'] is not None
+
+
+def test_abort(mock, tmpdir):
+    failures = []
+
+    def failing_run_workers(*args, **kwargs):
+        try:
+            return run_workers(*args, **kwargs)
+        except ValueError, e:
+            failures.append(str(e))
+            raise
+
+    agents = [start_agent(failing_run_workers), 'localhost:%s' % free_port()]
+    request = {'procs': 1, 'username': 'admin', 'password': 'password',
+               'hostname': mock, 'pin_cpus': None,
+               'kwargs': {'scheme': 'http'}}
+    with pytest.raises(socket.error):
+        coordinate(agents, str(tmpdir), request)
+    for i in range(50):
+        if failures:
+            break
+        threading.Event().wait(0.1)
+    assert failures == ['Aborted by coordinator']
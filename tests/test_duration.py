@@ -0,0 +1,43 @@
+# -*- coding: UTF-8 -*-
+
+"""Time bounded runs with warm-up and steady state detection"""
+
+import time
+
+from satellite_api_benchmark import Satellite5
+
+
+def test_duration_and_warmup(mock):
+    sab = Satellite5('admin', 'password', mock, scheme='http', duration=1,
+                     warmup=0.5)
+    start = time.time()
+    actions = sab.run()
+    end = time.time()
+    assert 1.5 <= end - start < 3
+    assert sab.iteration > 0
+    # Measurements started during warm-up are dropped
+    assert min([a['start'] for a in actions]) >= start + 0.5
+    assert max([a['start'] for a in actions]) <= start + 1.5
+    assert len(set([a['iteration'] for a in actions])) > 1
+
+
+def test_steady_state(mock):
+    sab = Satellite5('admin', 'password', mock, scheme='http',
+                     steady_window=3, steady_cv=0.05)
+    steady = [(i, {'a': 100.0 + i, 'b': 10.0}) for i in range(3)]
+    assert sab._steady(steady)
+    assert not sab._steady(steady[:2])
+    assert not sab._steady(steady[:2] + [(2, {'a': 150.0, 'b': 10.0})])
+    # Method missing in one of the iterations is not steady yet
+    assert not sab._steady(steady[:2] + [(2, {'a': 100.0, 'b': 10.0,
+                                              'c': 1.0})])
+
+
+def test_stop_on_steady_keeps_steady_iterations(mock):
+    sab = Satellite5('admin', 'password', mock, scheme='http', duration=5,
+                     steady_window=2, steady_cv=10, stop_on_steady=True)
+    actions = sab.run()
+    # Any throughput is steady with such coefficient of variation
+    assert sab.steady_from == 0
+    assert sab.iteration == 1
+    assert set([a['iteration'] for a in actions]) == set([0, 1])
@@ -0,0 +1,89 @@
+# -*- coding: UTF-8 -*-
+
+"""Bucket math and statistics of the latency histogram"""
+
+import math
+
+import pytest
+
+from satellite_api_benchmark.histogram import (Histogram, SUB_BUCKET_HALF,
+                                               _index, _bounds)
+
+
+def values():
+    """Microsecond values across many magnitudes, including bucket edges"""
+    out = set(range(0, 4 * SUB_BUCKET_HALF))
+    for shift in range(30):
+        for base in (1 << shift, 3 << shift, 5 << shift, 7 << shift):
+            out.update([base - 1, base, base + 1])
+    return sorted(v for v in out if v >= 0)
+
+
+def test_small_values_are_exact():
+    for value in range(2 * SUB_BUCKET_HALF):
+        assert _bounds(_index(value)) == (value, value)
+
+
+def test_bucket_contains_value_and_relative_error_is_bounded():
+    for value in values():
+        lowest, highest = _bounds(_index(value))
+        assert lowest <= value <= highest
+        if lowest:
+            assert float(highest - lowest) / lowest < 1.0 / SUB_BUCKET_HALF
+
+
+def test_buckets_are_contiguous():
+    previous = None
+    for index in range(2 * SUB_BUCKET_HALF - 1, 20 * SUB_BUCKET_HALF):
+        lowest, highest = _bounds(index)
+        if previous is not None:
+            assert lowest == previous + 1
+        assert _index(lowest) == index and _index(highest) == index
+        previous = highest
+
+
+def test_percentiles_and_average():
+    histogram = Histogram()
+    for i in range(1, 1001):
+        histogram.record(i / 1000.0)
+    assert histogram.count == 1000
+    assert histogram.mean() == pytest.approx(0.5005)
+    assert histogram.min == 0.001 and histogram.max == 1.0
+    assert histogram.percentile(50) == pytest.approx(0.5, rel=1.0 / SUB_BUCKET_HALF)
+    assert histogram.percentile(99) == pytest.approx(0.99, rel=1.0 / SUB_BUCKET_HALF)
+    assert histogram.percentile(100) == 1.0
+
+
+def test_mean_ci():
+    histogram = Histogram()
+    for i in range(1, 6):
+        histogram.record(i)
+    assert histogram.stdev() == pytest.approx(math.sqrt(2.5))
+    assert histogram.mean_ci() == pytest.approx(1.96 * math.sqrt(2.5 / 5))
+    assert Histogram().mean_ci() is None
+
+
+def test_percentile_ci():
+    histogram = Histogram()
+    for i in range(1, 1001):
+        histogram.record(i / 1000.0)
+    # Ranks 500 -+ 1.96 * sqrt(1000 * 0.5 * 0.5) (+ 1 for the upper one)
+    low, high = histogram.percentile_ci(50)
+    assert low == pytest.approx(0.469, rel=1.0 / SUB_BUCKET_HALF)
+    assert high == pytest.approx(0.532, rel=1.0 / SUB_BUCKET_HALF)
+    assert low < histogram.percentile(50) < high
+    assert Histogram().percentile_ci(50) == (None, None)
+
+
+def test_merge_and_round_trip():
+    a, b = Histogram(), Histogram()
+    for i in range(100):
+        a.record(i / 1000.0)
+        b.record(i / 100.0)
+    merged = Histogram().merge(a).merge(b)
+    assert merged.count == 200
+    assert merged.total == pytest.approx(a.total + b.total)
+    assert merged.min == 0.0 and merged.max == 0.99
+    copy = Histogram.from_dict(merged.to_dict())
+    assert copy.counts == merged.counts
+    assert copy.percentile(90) == merged.percentile(90)
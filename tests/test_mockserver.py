@@ -0,0 +1,42 @@
+# -*- coding: UTF-8 -*-
+
+"""Run the benchmark against the local mock server"""
+
+import xmlrpclib
+
+import pytest
+
+from satellite_api_benchmark import Satellite5
+from satellite_api_benchmark.mockserver import MockSatellite
+
+
+def test_run(mock):
+    sab = Satellite5('admin', 'password', mock, scheme='http')
+    actions = sab.run()
+    methods = set([a['method'] for a in actions])
+    assert 'auth.login' in methods
+    assert 'system.getDetails' in methods
+    assert 'packages.getDetails' in methods
+    assert sum([a.get('errors', 0) for a in actions]) == 0
+    for a in actions:
+        assert a['histogram'].count == a['repeats']
+
+
+def test_only_api_calls_are_served(mock):
+    server = xmlrpclib.ServerProxy('http://%s/rpc/api' % mock)
+    for method in ['populate', 'dispatch', 'random.random', 'packages',
+                   '_id', 'lock.acquire']:
+        with pytest.raises(xmlrpclib.Fault):
+            getattr(server, method)()
+    assert server.auth.login('admin', 'password')
+
+
+def test_seeded_mock_is_reproducible():
+    keys = []
+    for i in range(2):
+        satellite = MockSatellite(orgs=1, users=1, channels=1, packages=2,
+                                  errata=1, activationkeys=1, systems=1,
+                                  seed=42)
+        keys.append([satellite.dispatch('auth.login', ('admin', 'password'))
+                     for j in range(3)])
+    assert keys[0] == keys[1]
@@ -0,0 +1,27 @@
+# -*- coding: UTF-8 -*-
+
+"""Detail calls batched through system.multicall"""
+
+from satellite_api_benchmark import Satellite5
+
+
+def counts(actions):
+    out = {}
+    for a in actions:
+        out[a['method']] = out.get(a['method'], 0) + a['histogram'].count
+    return out
+
+
+def test_multicall_makes_the_same_calls(mock):
+    plain = Satellite5('admin', 'password', mock, scheme='http').run()
+    batched = Satellite5('admin', 'password', mock, scheme='http',
+                         multicall=4).run()
+    assert counts(batched) == counts(plain)
+    batches = [a for a in batched if 'batch' in a]
+    assert batches
+    for a in batches:
+        assert 1 <= a['repeats'] <= a['batch'] <= 4
+        assert a['repeats'] == len(a['args'])
+        # Every call of the batch gets its share of the batch duration
+        assert a['histogram'].max <= a['end'] - a['start']
+    assert 'system.getDetails' in set(a['method'] for a in batches)
@@ -0,0 +1,23 @@
+# -*- coding: UTF-8 -*-
+
+"""Phases of measured calls"""
+
+import pytest
+
+from satellite_api_benchmark import Satellite5
+from satellite_api_benchmark.transport import PHASES
+
+
+def test_phases_add_up_to_latency(slow_mock):
+    actions = Satellite5('admin', 'password', slow_mock, scheme='http',
+                         connection='fresh', sample=1).run()
+    for a in actions:
+        phases = a['phases']
+        assert set(phases) == set(PHASES + ['request_bytes', 'response_bytes'])
+        assert phases['request_bytes'] > 0 and phases['response_bytes'] > 0
+        assert phases['connect'] > 0   # fresh connection for every call
+        # Mock sleeps before responding, which is the server wait
+        assert phases['ttfb'] >= 0.05 * a['repeats']
+        total = sum([phases[p] for p in PHASES])
+        assert total <= a['histogram'].total
+        assert total == pytest.approx(a['histogram'].total, rel=0.1)
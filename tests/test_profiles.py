@@ -0,0 +1,34 @@
+# -*- coding: UTF-8 -*-
+
+"""Generated client profiles and fitting of scaling exponent"""
+
+import pytest
+
+from satellite_api_benchmark.profiles import (package_profile,
+                                              updated_package_profile,
+                                              hardware_profile,
+                                              scaling_exponent)
+
+
+def test_scaling_exponent():
+    assert scaling_exponent([(1, 1), (2, 4), (4, 16)]) == pytest.approx(2.0)
+    assert scaling_exponent([(10, 0.5), (100, 5), (1000, 50)]) \
+        == pytest.approx(1.0)
+    assert scaling_exponent([(10, 3), (100, 3)]) == pytest.approx(0.0)
+    assert scaling_exponent([(10, 1), (10, 2)]) is None
+    assert scaling_exponent([(10, 1), (0, 2)]) is None
+
+
+def test_profiles():
+    packages = package_profile(10, applicable=3)
+    assert len(packages) == 10
+    assert [p['name'] for p in packages[-3:]] == \
+        ['benchmark-org-0-package-%s' % i for i in range(3)]
+    updated = updated_package_profile(packages)
+    assert [p['release'] for p in updated] == ['4'] * 7 + ['1'] * 3
+    assert packages[0]['release'] == '3'
+    hardware = hardware_profile(devices=20, interfaces=3, system=300)
+    interfaces = [h for h in hardware if h['class'] == 'NETINTERFACES'][0]
+    assert sorted(interfaces) == ['class', 'eth0', 'eth1', 'eth2', 'lo']
+    assert interfaces['eth1']['hwaddr'] == '52:54:01:2c:00:01'
+    assert hardware_profile(system=1) != hardware_profile(system=2)
@@ -0,0 +1,31 @@
+# -*- coding: UTF-8 -*-
+
+"""Open-loop runs at constant rate"""
+
+import pytest
+
+from satellite_api_benchmark import Satellite5
+
+
+def test_sustained_rate(mock):
+    sab = Satellite5('admin', 'password', mock, scheme='http', rate_threads=4)
+    actions = sab.run_rate(20, 1.5)
+    assert sum([a['histogram'].count for a in actions]) == 30
+    a = actions[0]
+    assert a['achieved_rate'] == pytest.approx(20, rel=0.15)
+    assert a['max_backlog'] <= 2
+    assert a['max_start_lag'] < 0.1
+
+
+def test_overload_shows_as_backlog(slow_mock):
+    # One thread serves at most 20 calls/s
+    sab = Satellite5('admin', 'password', slow_mock, scheme='http',
+                     rate_threads=1)
+    actions = sab.run_rate(100, 1)
+    assert sum([a['histogram'].count for a in actions]) == 100
+    a = actions[0]
+    assert a['achieved_rate'] < 25
+    assert a['max_backlog'] > 50
+    assert a['max_start_lag'] > 2
+    # Latency is measured from the schedule, including the wait
+    assert max([r['histogram'].max for r in actions]) > 2
@@ -0,0 +1,61 @@
+# -*- coding: UTF-8 -*-
+
+"""Measurements streamed into per-worker JSONL files"""
+
+import os
+import json
+
+from satellite_api_benchmark import Satellite5, Histogram, load_results, \
+    results_files
+from satellite_api_benchmark.results import ResultsWriter, ResultsFollower
+
+
+def measurement(method, start, end, count=1):
+    histogram = Histogram()
+    for i in range(count):
+        histogram.record(0.001)
+    return {'method': method, 'start': start, 'end': end,
+            'histogram': histogram}
+
+
+def test_streamed_run_matches_run_in_memory(mock, tmpdir):
+    in_memory = Satellite5('admin', 'password', mock, scheme='http').run()
+    path = Satellite5('admin', 'password', mock, scheme='http',
+                      results_dir=str(tmpdir)).run()
+    assert results_files(str(tmpdir)) == [path]
+    streamed = list(load_results(path))
+    assert [(r['method'], r['histogram'].count) for r in streamed] == \
+        [(a['method'], a['histogram'].count) for a in in_memory]
+    # Usage of the worker is a marker, not a measurement
+    with open(path) as f:
+        types = [json.loads(line).get('type') for line in f]
+    assert types.count('usage') == 1
+
+
+def test_crashed_worker_and_markers(tmpdir):
+    writer = ResultsWriter(str(tmpdir))
+    writer.write(measurement('a', 1.0, 2.0, 3))
+    writer.mark(steady_from=1)
+    writer.write(dict(measurement('b', 2.0, 3.0), iteration=1))
+    writer.close()
+    with open(writer.path, 'a') as f:
+        f.write('{"method": "c", "sta')   # killed while writing
+    records = list(load_results(writer.path))
+    # Iteration 0 is before steady state, marker and broken line skipped
+    assert [r['method'] for r in records] == ['b']
+
+
+def test_follower_returns_new_complete_lines(tmpdir):
+    follower = ResultsFollower(str(tmpdir))
+    assert follower.records() == []
+    writer = ResultsWriter(str(tmpdir))
+    writer.write(measurement('a', 1.0, 2.0))
+    writer.mark(type='usage')
+    writer.file.write('{"method": "b"')
+    writer.file.flush()
+    assert [r['method'] for r in follower.records()] == ['a']
+    writer.file.write(', "start": 2, "end": 3}\n')
+    writer.close()
+    assert [r['method'] for r in follower.records()] == ['b']
+    assert follower.lines() == []
+    assert os.path.basename(writer.path).startswith('worker-')
@@ -0,0 +1,85 @@
+# -*- coding: UTF-8 -*-
+
+"""Sampling of server processes and spikes matched to the samples"""
+
+import os
+import sys
+import json
+import time
+import subprocess
+
+import pytest
+
+from satellite_api_benchmark import Histogram, ProcessSampler, \
+    load_samples, mark_run
+from satellite_api_benchmark.results import ResultsWriter
+from satellite_api_benchmark.sampler import SAMPLES_FILE
+
+
+# Unique for this test run
+MARKER = 'busy-marker-%s' % os.getpid()
+
+
+@pytest.fixture
+def busy_process():
+    """Child process burning CPU, with MARKER on its command line"""
+    process = subprocess.Popen([sys.executable, '-c',
+                                'while True: pass  # ' + MARKER])
+    for i in range(100):
+        with open('/proc/%s/cmdline' % process.pid) as f:
+            if MARKER in f.read():
+                break   # executed, not just forked
+        time.sleep(0.01)
+    yield process
+    process.kill()
+    process.wait()
+
+
+def test_first_matching_group_wins(busy_process):
+    sampler = ProcessSampler('.', [('busy', MARKER),
+                                   ('python', r'python'),
+                                   ('unused', r'no-such-process-x')])
+    processes = sampler.processes()
+    assert processes[busy_process.pid] == 'busy'
+    assert processes[os.getpid()] == 'python'
+    assert 'unused' not in processes.values()
+
+
+def test_samples(busy_process, tmpdir):
+    sampler = ProcessSampler(str(tmpdir), [('busy', MARKER)], 0.2)
+    start = time.time()
+    sampler.start()
+    time.sleep(0.7)
+    sampler.stop()
+    samples = load_samples(str(tmpdir))
+    # Priming sample is not written, the last interval is cut by stop()
+    assert 3 <= len(samples) <= 4
+    assert samples[0]['time'] >= start + 0.2
+    for sample in samples:
+        assert sample['group'] == 'busy' and sample['processes'] == 1
+        assert sample['threads'] == 1 and sample['rss'] > 0
+    assert samples[1]['cpu'] == pytest.approx(1.0, abs=0.3)
+
+
+def test_spikes_are_placed_from_run_start(cli, tmpdir, capsys):
+    results_dir = str(tmpdir)
+    writer = ResultsWriter(results_dir)
+    for start, duration in [(100.0, 0.1), (100.1, 0.5), (100.6, 0.1)]:
+        histogram = Histogram()
+        histogram.record(duration)
+        writer.write({'method': 'm', 'args': (start,), 'start': start,
+                      'end': start + duration, 'connections': 0,
+                      'histogram': histogram})
+    writer.close()
+    mark_run(results_dir, released=100.0)
+    # The first sample comes one interval after the run started
+    with open(os.path.join(results_dir, SAMPLES_FILE), 'w') as f:
+        for t, cpu in [(101.0, 2.0), (102.0, 0.5)]:
+            f.write(json.dumps({'time': t, 'group': 'tomcat', 'cpu': cpu,
+                                'processes': 1, 'rss': 0, 'threads': 1,
+                                'read_bytes': 0, 'write_bytes': 0}) + '\n')
+    cli.report(results_dir, whole_run=True)
+    out = capsys.readouterr()[0]
+    lines = out[out.index('at second'):].splitlines()
+    slowest = [cell.strip() for cell in lines[2].split('|')]
+    assert slowest[2:6] == ['[100.1]', '0.5', '0.6', '2']
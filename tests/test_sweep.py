@@ -0,0 +1,29 @@
+# -*- coding: UTF-8 -*-
+
+"""Concurrency sweep"""
+
+import os
+
+from satellite_api_benchmark import results_files
+
+
+def test_sweep(cli, slow_mock, tmpdir, capsys):
+    results_dir = str(tmpdir)
+    cli.sweep([1, 2], 1, 1, 0.1, 'admin', 'password', slow_mock, results_dir,
+              scheme='http', duration=1)
+    out = capsys.readouterr()[0]
+    assert 'SWEEP 1 warm-up 0' in out and 'SWEEP 2 run 0' in out
+    for procs in [1, 2]:
+        for run in ['warmup-0', 'run-0']:
+            assert len(results_files(os.path.join(
+                results_dir, 'level-%s' % procs, run))) == procs
+    lines = out.splitlines()
+    header = [i for i, line in enumerate(lines) if 'speedup' in line][0]
+    speedups = {}
+    for line in lines[header + 2:header + 4]:
+        row = [cell.strip() for cell in line.split('|')]
+        speedups[int(row[1])] = float(row[3])
+    # Mock serves calls concurrently, two workers double the throughput
+    assert speedups[1] == 1.0
+    assert speedups[2] > 1.5
+    assert 'KNEE not found, throughput still grows at 2' in out
@@ -0,0 +1,77 @@
+# -*- coding: UTF-8 -*-
+
+"""Per interval aggregation of measurements while the run goes on"""
+
+import csv
+import time
+import socket
+import urllib2
+
+import pytest
+
+from satellite_api_benchmark import Histogram, RollingAggregator
+from satellite_api_benchmark.results import ResultsWriter
+
+
+def write(writer, method, end, durations, errors=0):
+    histogram = Histogram()
+    for duration in durations:
+        histogram.record(duration)
+    writer.write({'method': method, 'start': end - sum(durations),
+                  'end': end, 'errors': errors, 'histogram': histogram})
+
+
+def free_port():
+    s = socket.socket()
+    s.bind(('localhost', 0))
+    port = s.getsockname()[1]
+    s.close()
+    return port
+
+
+def wait_for(condition, timeout=5):
+    end = time.time() + timeout
+    while not condition() and time.time() < end:
+        time.sleep(0.05)
+
+
+def test_intervals_totals_and_late_measurements(tmpdir):
+    results_dir = str(tmpdir.mkdir('results'))
+    csv_path = str(tmpdir.join('timeline.csv'))
+    metrics_path = str(tmpdir.join('metrics.prom'))
+    port = free_port()
+    writer = ResultsWriter(results_dir)
+    base = int(time.time()) - 10
+    write(writer, 'a', base + 0.1, [0.01, 0.02, 0.03])
+    write(writer, 'a', base + 1.1, [0.01])
+    write(writer, 'b', base + 1.2, [0.5], errors=1)
+    aggregator = RollingAggregator(results_dir, 1.0, csv_path=csv_path,
+                                   prometheus_path=metrics_path,
+                                   prometheus_port=port)
+    aggregator.start()
+    try:
+        url = 'http://localhost:%s' % port
+        wait_for(lambda: 'method="b"' in urllib2.urlopen(url + '/metrics').read())
+        metrics = urllib2.urlopen(url + '/metrics').read()
+        with pytest.raises(urllib2.HTTPError) as e:
+            urllib2.urlopen(url + '/')
+        assert e.value.code == 404
+        # Interval already reported, must not be reported again
+        write(writer, 'a', base + 0.2, [0.04])
+        time.sleep(1.5)
+    finally:
+        aggregator.stop()
+    writer.close()
+    assert 'satellite_api_latency_seconds{method="b",quantile="0.5"}' in metrics
+    assert 'satellite_api_errors_total{method="b"} 1.0' in metrics
+    with open(csv_path) as f:
+        rows = list(csv.DictReader(f))
+    assert [(float(r['time']), r['method'], int(r['calls'])) for r in rows] == \
+        [(base, 'a', 3), (base + 1, 'a', 1), (base + 1, 'b', 1)]
+    with open(metrics_path) as f:
+        metrics = f.read()
+    # Late measurement is counted in totals
+    assert 'satellite_api_latency_seconds_count{method="a"} 5.0' in metrics
+    total = [l for l in metrics.splitlines()
+             if l.startswith('satellite_api_latency_seconds_sum{method="a"}')]
+    assert float(total[0].split()[1]) == pytest.approx(0.11)
@@ -0,0 +1,58 @@
+# -*- coding: UTF-8 -*-
+
+"""Recording traces of API calls and replaying them"""
+
+import multiprocessing.pool
+
+from satellite_api_benchmark import Satellite5, load_trace
+
+
+def record(cli, mock, tmpdir):
+    trace_dir = str(tmpdir.join('trace'))
+    cli.run_workers(2, 'admin', 'password', mock,
+                    str(tmpdir.mkdir('results')), scheme='http',
+                    trace_dir=trace_dir)
+    return load_trace(trace_dir)
+
+
+def test_trace_round_trip(cli, mock, tmpdir):
+    trace = record(cli, mock, tmpdir)
+    # Sessions are named by worker process and number of its login
+    assert len(set(s.rsplit('-', 1)[0] for s in trace)) == 2
+    methods = set()
+    for calls in trace.values():
+        assert calls[0]['method'] == 'auth.login'
+        assert calls[0]['args'][1] == 'xxx'
+        assert [c['method'] for c in calls[1:]].count('auth.login') == 0
+        assert [c['time'] for c in calls] == sorted(c['time'] for c in calls)
+        methods.update(c['method'] for c in calls)
+    assert 'packages.getDetails' in methods
+
+
+def test_replay(cli, mock, tmpdir, monkeypatch):
+    trace = record(cli, mock, tmpdir)
+    pools = []
+
+    class ThreadPool(multiprocessing.pool.ThreadPool):
+        def __init__(self, processes=None, *args, **kwargs):
+            pools.append(processes)
+            super(ThreadPool, self).__init__(processes, *args, **kwargs)
+
+    monkeypatch.setattr(multiprocessing.pool, 'ThreadPool', ThreadPool)
+    sab = Satellite5('admin', 'password', mock, scheme='http')
+    actions = sab.replay(trace, speed=100)
+    # As many threads as workers recorded the trace, not one per session
+    assert pools == [2]
+    replayed = dict((a['method'], a['histogram'].count) for a in actions)
+    recorded = {}
+    for calls in trace.values():
+        for call in calls:
+            recorded[call['method']] = recorded.get(call['method'], 0) + 1
+    assert replayed == recorded
+    assert sum([a['errors'] for a in actions]) == 0
+
+    sab = Satellite5('admin', 'password', mock, scheme='http',
+                     replay_threads=1)
+    pools[:] = []
+    sab.replay(trace, speed=100)
+    assert pools == [1]
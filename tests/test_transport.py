@@ -0,0 +1,36 @@
+# -*- coding: UTF-8 -*-
+
+"""Keep-alive and fresh connection transports"""
+
+import xmlrpclib
+
+from satellite_api_benchmark import Satellite5
+from satellite_api_benchmark.transport import make_transport
+
+
+def calls(mock, mode, count):
+    """Make count calls in given connection mode, return the transport"""
+    url = 'http://%s/rpc/api' % mock
+    transport = make_transport(url, mode)
+    server = xmlrpclib.ServerProxy(url, transport=transport)
+    for i in range(count):
+        assert server.auth.login('admin', 'password')
+    return transport
+
+
+def test_keepalive_reuses_connection(mock):
+    assert calls(mock, 'keepalive', 5).connections == 1
+
+
+def test_fresh_connection_for_every_call(mock):
+    assert calls(mock, 'fresh', 5).connections == 5
+
+
+def test_run_counts_connections_of_measured_calls(mock):
+    actions = Satellite5('admin', 'password', mock, scheme='http',
+                         connection='fresh').run()
+    for a in actions:
+        assert a['connections'] == a['repeats']
+    actions = Satellite5('admin', 'password', mock, scheme='http').run()
+    # The only connection was opened by unmeasured login
+    assert sum([a['connections'] for a in actions]) == 0
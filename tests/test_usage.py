@@ -0,0 +1,54 @@
+# -*- coding: UTF-8 -*-
+
+"""Resource usage of workers and client saturation warnings"""
+
+import os
+import time
+
+import pytest
+
+from satellite_api_benchmark import Satellite5, results_files, load_usage
+from satellite_api_benchmark.usage import snapshot, usage_delta
+
+
+def busy(seconds):
+    end = time.time() + seconds
+    while time.time() < end:
+        pass
+
+
+def test_usage_delta_of_busy_and_idle_process():
+    before = snapshot()
+    busy(0.3)
+    usage = usage_delta(before, snapshot())
+    assert usage['pid'] == os.getpid()
+    assert usage['cpu'] == pytest.approx(1.0, abs=0.2)
+    assert usage['user'] + usage['sys'] == pytest.approx(0.3, abs=0.06)
+    assert usage['maxrss'] >= usage['rss'] > 0
+    before = snapshot()
+    time.sleep(0.3)
+    assert usage_delta(before, snapshot())['cpu'] < 0.2
+
+
+def test_run_records_usage(mock, tmpdir):
+    sab = Satellite5('admin', 'password', mock, scheme='http',
+                     results_dir=str(tmpdir))
+    sab.run()
+    usages = load_usage(results_files(str(tmpdir))[0])
+    assert len(usages) == 1
+    assert usages[0]['start'] <= usages[0]['end']
+    assert usages[0]['voluntary'] > 0   # waited for the mock
+
+
+def test_saturation_warnings(cli, capsys):
+    usage = {'pid': 1, 'user': 0.9, 'sys': 0.05, 'cpu': 0.95, 'rss': 1024,
+             'maxrss': 2048, 'voluntary': 1, 'involuntary': 1,
+             'start': 0.0, 'end': 1.0}
+    cli.print_usage([usage, dict(usage, pid=2)], cpus=2)
+    out = capsys.readouterr()[0]
+    assert 'CLIENT CPU 0.95 of 2 CPUs' in out
+    assert 'WARNING: Worker 0 was busy on CPU 95%' in out
+    assert 'WARNING: Workers used 95% of all CPUs' in out
+    cli.print_usage([dict(usage, user=0.1, sys=0.0, cpu=0.1)], cpus=4)
+    out = capsys.readouterr()[0]
+    assert 'CLIENT CPU 0.03 of 4 CPUs' in out and 'WARNING' not in out
@@ -0,0 +1,65 @@
+# -*- coding: UTF-8 -*-
+
+"""Workers starting together and the window when all of them measured"""
+
+import pytest
+
+from satellite_api_benchmark import (Histogram, concurrent_window, mark_run,
+                                     load_run, load_results, results_files)
+from satellite_api_benchmark.results import ResultsWriter
+
+
+def write(results_dir, spans):
+    writer = ResultsWriter(results_dir)
+    for start, end in spans:
+        histogram = Histogram()
+        histogram.record(end - start)
+        writer.write({'method': 'api.getVersion', 'start': start, 'end': end,
+                      'histogram': histogram})
+    writer.close()
+
+
+def test_window_starts_with_last_first_measurement(tmpdir):
+    results_dir = str(tmpdir)
+    mark_run(results_dir, released=100.0)
+    # Second worker warmed up longer
+    write(results_dir, [(101.0, 102.0), (102.0, 110.0)])
+    write(results_dir, [(103.0, 104.0), (104.0, 108.0)])
+    window = concurrent_window(results_dir)
+    assert window['window'] == (103.0, 108.0)
+    assert window['start_skew'] == 2.0
+    assert window['end_skew'] == 2.0
+
+
+def test_window_never_before_release(tmpdir):
+    results_dir = str(tmpdir)
+    mark_run(results_dir, released=105.0)
+    write(results_dir, [(101.0, 110.0)])
+    write(results_dir, [(103.0, 108.0)])
+    assert concurrent_window(results_dir)['window'] == (105.0, 108.0)
+
+
+def test_workers_overlapping_nowhere(tmpdir):
+    results_dir = str(tmpdir)
+    write(results_dir, [(101.0, 102.0)])
+    write(results_dir, [(103.0, 104.0)])
+    assert concurrent_window(results_dir)['window'] is None
+
+
+def test_warmup_with_barrier(cli, mock, tmpdir):
+    results_dir = str(tmpdir)
+    wall = cli.run_workers(2, 'admin', 'password', mock, results_dir,
+                           scheme='http', duration=1, warmup=1)
+    released = load_run(results_dir)['released']
+    files = results_files(results_dir)
+    assert len(files) == 2
+    firsts = [min(r['start'] for r in load_results(f)) for f in files]
+    # Nothing of the warm-up is recorded and workers were released at once
+    assert min(firsts) >= released + 1
+    window = concurrent_window(results_dir)
+    start, end = window['window']
+    assert start == max(firsts)
+    assert end - start <= window['end'] - released - 1
+    # Window covers measurements after warm-up, not the warm-up itself
+    assert end - start == pytest.approx(1, abs=0.5)
+    assert end - start < wall - 1
@@ -0,0 +1,77 @@
+# -*- coding: UTF-8 -*-
+
+"""Workload steps and sampling of foreach items"""
+
+import pytest
+
+from satellite_api_benchmark.workload import (
+    resolve, foreach_items, step_kind, check_workload, execute_workload,
+    sampler, shipped_workloads, load_workload)
+
+
+def test_resolve():
+    variables = {'org': {'id': 3, 'name': 'o'}, 'ids': [1, 2]}
+    assert resolve('$org.id', variables) == 3
+    assert resolve(['$org.name', '$item.id', 'x', 5], variables,
+                   {'id': 7}) == ['o', 7, 'x', 5]
+    assert resolve('$ids', variables) == [1, 2]
+    with pytest.raises(AssertionError):
+        resolve('$missing', variables)
+
+
+def test_step_kind():
+    assert step_kind({'method': 'a'}) == 'method'
+    assert step_kind({'foreach': 'x', 'method': 'a'}) == 'foreach'
+    assert step_kind({'find': 'x', 'in': 'y', 'where': {}}) == 'find'
+    with pytest.raises(AssertionError):
+        step_kind({'login': ['a', 'b'], 'mix': []})
+    with pytest.raises(AssertionError):
+        check_workload({'steps': [{'mix': [{'method': 'a', 'weight': 0}],
+                                   'calls': 1}]})
+    for name in shipped_workloads():
+        load_workload(name)
+
+
+def test_foreach_until():
+    items = [{'id': i} for i in range(5)]
+    step = {'foreach': 'items', 'until': {'id': 2}}
+    assert foreach_items(step, {'items': items}) == items[:3]
+
+
+def test_execute_workload():
+    made = []
+
+    def call(repeats, method, args):
+        made.append((repeats, method) + args)
+        return [{'id': 1, 'name': 'a'}, {'id': 2, 'name': 'b'}]
+
+    def call_each(calls):
+        made.extend(calls)
+        return [c[1] for c in calls]
+
+    workload = {'repeats': 3, 'steps': [
+        {'method': 'list', 'args': ['$key'], 'save': 'things'},
+        {'find': 'thing', 'in': 'things', 'where': {'name': 'b'}},
+        {'foreach': 'things', 'method': 'get', 'args': ['$key', '$item.id'],
+         'save': 'ids'},
+        {'method': 'details', 'repeats': 1, 'args': ['$thing.id']},
+        {'mix': [{'method': 'm', 'args': ['$key']}], 'calls': 2}]}
+    check_workload(workload)
+    variables = execute_workload(workload, {'key': 'k'}, None, call, call_each)
+    assert made == [(3, 'list', 'k'), ('get', 'k', 1), ('get', 'k', 2),
+                    (1, 'details', 2), ('m', 'k'), ('m', 'k')]
+    assert variables['ids'] == ['k', 'k']
+    assert variables['thing'] == {'id': 2, 'name': 'b'}
+
+
+def test_sampler():
+    items = list(range(100))
+    assert sampler(1000)(items) == items
+    sample = sampler(10, seed=1)(items)
+    assert len(sample) == 10 and sample == sorted(sample)
+    assert set(sample) <= set(items)
+    assert sample == sampler(10, seed=1)(items)
+    assert len(sampler(0.25)(items)) == 25
+    assert len(sampler(0.001)(items)) == 1   # rounded up, never empty
+    assert len(sampler(2.5)(items)) == 2
+    assert sampler(10, seed=1)(items) != sampler(10, seed=2)(items)